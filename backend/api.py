@@ -1,33 +1,56 @@
-from flask import Flask, request, jsonify, Response, session
+from flask import Flask, request, jsonify, Response, session, g
 from flask_cors import CORS
-import mysql.connector
 import cv2
-from PIL import Image
 import numpy as np
 import os
 import time
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 import logging
 import base64
+from concurrent.futures import ThreadPoolExecutor
 
-logging.basicConfig(level=logging.DEBUG)
+import attendance_history
+import attendance_rollup
+import attendance_writer
+import camera
+import dataset_capture
+import db
+import events
+import metrics
+from employee_directory import directory
+from live_recognition import LiveRecognizer
+from model_registry import registry
+import training
+import training_jobs
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'noeltoktil'
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173", "http://localhost:8082", "http://localhost:8081", "http://localhost:3000"]}}, supports_credentials=True)
 
-cnt = 0
-pause_cnt = 0
-justscanned = False
-
-# Database connection
+# Database connection (pooled; host/credentials come from DB_* env vars, see db.py)
 def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        passwd="",
-        database="flask_db"
-    )
+    return db.get_connection()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # The route pattern, not the path, keeps the label set small
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_requests.observe(time.perf_counter() - started, method=request.method,
+                                      endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.errorhandler(db.PoolTimeout)
+def handle_pool_timeout(e):
+    return jsonify({'success': False, 'message': 'Database busy, please retry'}), 503
 
 # ==================== AUTH ENDPOINTS ====================
 
@@ -63,26 +86,77 @@ def api_me():
 
 # ==================== EMPLOYEES ENDPOINTS ====================
 
+# Page size for GET /api/employees
+EMPLOYEES_PAGE_SIZE = 50
+EMPLOYEES_MAX_PAGE_SIZE = 500
+
 @app.route('/api/employees', methods=['GET'])
 def get_employees():
-    mydb = get_db_connection()
-    mycursor = mydb.cursor()
+    """List employees from the cached directory.
     
-    mycursor.execute("SELECT prs_nbr, prs_name, prs_skill, prs_active, prs_added FROM prs_mstr")
-    employees = mycursor.fetchall()
+    Query: q (matches id or name), page (from 1), pageSize (default 50).
+    Without page and pageSize the whole (filtered) list is returned, as
+    before paging existed, and there is no pagination block. The
+    response carries an ETag / Last-Modified for the directory version;
+    a request whose If-None-Match / If-Modified-Since is still current
+    gets 304 without building the list.
+    """
+    paged = 'page' in request.args or 'pageSize' in request.args
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('pageSize', EMPLOYEES_PAGE_SIZE))
+        valid = page >= 1 and 1 <= page_size <= EMPLOYEES_MAX_PAGE_SIZE
+    except ValueError:
+        valid = False
+    if not valid:
+        return jsonify({
+            'success': False,
+            'message': f'page must be an integer >= 1 and pageSize an integer between 1 and {EMPLOYEES_MAX_PAGE_SIZE}'
+        }), 400
     
-    result = []
-    for emp in employees:
-        result.append({
-            'id': emp[0],
-            'name': emp[1],
-            'position': emp[2],
-            'active': emp[3],
-            'createdAt': emp[4].isoformat() if emp[4] else None
-        })
+    version, changed_at = directory.version()
+    last_modified = datetime.fromtimestamp(int(changed_at), timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(version)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
     
-    mydb.close()
-    return jsonify({'success': True, 'data': result})
+    if not_modified:
+        response = Response(status=304)
+    else:
+        employees = directory.listing()
+        q = request.args.get('q', '').strip().lower()
+        if q:
+            employees = [e for e in employees if q in e.nbr.lower() or q in (e.name or '').lower()]
+        
+        selected = employees
+        if paged:
+            start = (page - 1) * page_size
+            selected = employees[start:start + page_size]
+        result = []
+        for emp in selected:
+            result.append({
+                'id': emp.nbr,
+                'name': emp.name,
+                'position': emp.skill,
+                'active': emp.active,
+                'createdAt': emp.added.isoformat() if emp.added else None
+            })
+        
+        body = {'success': True, 'data': result}
+        if paged:
+            body['pagination'] = {
+                'page': page,
+                'pageSize': page_size,
+                'total': len(employees),
+                'totalPages': (len(employees) + page_size - 1) // page_size
+            }
+        response = jsonify(body)
+    
+    response.set_etag(version)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/employees/next-id', methods=['GET'])
 def get_next_employee_id():
@@ -113,6 +187,7 @@ def register_employee():
         )
         mydb.commit()
         mydb.close()
+        directory.invalidate()
         
         return jsonify({
             'success': True,
@@ -123,61 +198,77 @@ def register_employee():
         mydb.close()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/employees/<nbr>/deactivate', methods=['POST'])
+def deactivate_employee(nbr):
+    """Mark an employee inactive (prs_active = 'N')"""
+    mydb = get_db_connection()
+    mycursor = mydb.cursor()
+    
+    try:
+        mycursor.execute("UPDATE prs_mstr SET prs_active = 'N' WHERE prs_nbr = %s", (nbr,))
+        updated = mycursor.rowcount
+        mydb.commit()
+        mydb.close()
+        directory.invalidate()
+        
+        if not updated:
+            return jsonify({'success': False, 'message': 'Employee not found'}), 404
+        
+        return jsonify({'success': True, 'message': 'Employee deactivated', 'employeeId': nbr})
+    except Exception as e:
+        mydb.close()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ==================== FACE RECOGNITION ENDPOINTS ====================
 
 def generate_dataset_api(nbr):
     """Generate dataset for face recognition"""
-    face_classifier = cv2.CascadeClassifier("resources/haarcascade_frontalface_default.xml")
-    
-    def face_cropped(img):
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        faces = face_classifier.detectMultiScale(gray, 1.3, 7)
-        
-        if len(faces) == 0:
-            return None
-        for (x, y, w, h) in faces:
-            cropped_face = img[y:y + h, x:x + w]
-        return cropped_face
-    
-    cap = cv2.VideoCapture(0)
+    face_classifier = registry.get_cascade()
     
+    # Reserve this enrollment's image ids up front; safe against concurrent enrollments
     mydb = get_db_connection()
-    mycursor = mydb.cursor()
-    mycursor.execute("SELECT IFNULL(MAX(img_id), 0) FROM img_dataset")
-    row = mycursor.fetchone()
-    lastid = row[0]
+    try:
+        first_id = dataset_capture.reserve_image_ids(mydb)
+    finally:
+        mydb.close()
     
-    img_id = lastid
-    max_imgid = img_id + 100
     count_img = 0
+    writer = dataset_capture.ImageWriter(nbr)
     
-    while True:
-        ret, img = cap.read()
-        if face_cropped(img) is not None:
-            count_img += 1
-            img_id += 1
-            face = cv2.resize(face_cropped(img), (200, 200))
-            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
-            
-            file_name_path = f"dataset/{nbr}.{img_id}.jpg"
-            cv2.imwrite(file_name_path, face)
-            cv2.putText(face, str(count_img), (50, 50), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 0), 2)
+    # Frames come from the shared capture thread, so enrollment can run
+    # while the recognition stream is open
+    cam = camera.get_camera()
+    cam.acquire()
+    seq = 0
+    
+    try:
+        while count_img < dataset_capture.IMAGES_PER_PERSON:
+            item = cam.raw.wait_for(seq, timeout=5.0)
+            if item is None:
+                break
+            seq, img = item
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            face = dataset_capture.crop_face(face_classifier, gray)
+            if face is None:
+                continue
             
-            mycursor.execute(
-                "INSERT INTO img_dataset (img_id, img_person) VALUES (%s, %s)",
-                (img_id, nbr)
-            )
-            mydb.commit()
+            img_id = first_id + count_img
+            count_img += 1
+            writer.write(img_id, face)
             
-            frame = cv2.imencode('.jpg', face)[1].tobytes()
+            preview = face.copy()
+            cv2.putText(preview, str(count_img), (50, 50), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 0), 2)
+            frame = cv2.imencode('.jpg', preview)[1].tobytes()
             yield (b'--frame\r\n'b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            
-            if cv2.waitKey(1) == 13 or int(img_id) == int(max_imgid):
-                break
-    
-    cap.release()
-    cv2.destroyAllWindows()
-    mydb.close()
+    finally:
+        cam.release()
+        # Also runs when the client disconnects early: record what was saved
+        written = writer.close()
+        mydb = get_db_connection()
+        try:
+            dataset_capture.insert_images(mydb, nbr, written)
+        finally:
+            mydb.close()
 
 @app.route('/api/face/dataset/<nbr>')
 def api_generate_dataset(nbr):
@@ -189,135 +280,226 @@ def api_generate_dataset(nbr):
 
 @app.route('/api/face/train/<nbr>', methods=['POST'])
 def api_train_classifier(nbr):
-    """Train face recognition classifier"""
+    """Queue face recognition training as a background job.
+
+    By default only the images of employee <nbr> that are not in the model
+    yet are added (LBPH update). Pass ?full=1 or {"full": true} to rebuild
+    the model from the whole dataset. Returns 202 with a job id right away;
+    train requests arriving while a job is still queued join that job.
+    Pass ?wait=<seconds> to block until the job finishes (old behaviour).
+    """
     try:
-        dataset_dir = "dataset"
-        
-        # Get all image files
-        if not os.path.exists(dataset_dir):
-            return jsonify({'success': False, 'message': 'Dataset directory not found'}), 404
-        
-        image_files = [f for f in os.listdir(dataset_dir) if f.endswith('.jpg')]
-        
-        if len(image_files) == 0:
-            return jsonify({'success': False, 'message': 'No images found in dataset'}), 404
-        
-        faces = []
-        labels = []
-        
-        for image_file in image_files:
-            try:
-                # Parse filename: person_id.img_id.jpg (e.g., 102.1.jpg)
-                parts = image_file.split('.')
-                if len(parts) >= 3:
-                    person_id = int(parts[0])  # Use person_id as label (102)
-                    
-                    # Load and process image
-                    img_path = os.path.join(dataset_dir, image_file)
-                    img = Image.open(img_path).convert('L')
-                    img_array = np.array(img, 'uint8')
-                    
-                    faces.append(img_array)
-                    labels.append(person_id)
-            except Exception as e:
-                print(f"Error processing {image_file}: {e}")
-                continue
-        
-        if len(faces) == 0:
-            return jsonify({'success': False, 'message': 'No valid faces found'}), 400
-        
-        labels = np.array(labels)
+        data = request.get_json(silent=True) or {}
+        full = request.args.get('full', '').lower() in ('1', 'true', 'yes') or bool(data.get('full'))
         
-        # Train the classifier
-        clf = cv2.face.LBPHFaceRecognizer_create()
-        clf.train(faces, labels)
-        clf.write("classifier.xml")
+        job = training_jobs.queue.submit(nbr, full=full)
         
-        # Get unique persons count
-        unique_persons = len(set(labels))
+        wait = request.args.get('wait', type=float)
+        if wait:
+            job.done.wait(timeout=wait)
         
+        return _training_job_response(job)
+    except training.TrainingError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def _training_job_response(job):
+    status = training_jobs.queue.describe(job)
+    
+    if job.status == 'done':
         return jsonify({
             'success': True,
             'message': 'Classifier trained successfully',
-            'total_images': len(faces),
-            'unique_persons': unique_persons
+            **job.result,
+            'job': status
         })
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)}), 500
+    if job.status == 'failed':
+        return jsonify({'success': False, 'message': job.error, 'job': status}), job.error_code
+    
+    return jsonify({
+        'success': True,
+        'message': 'Training job queued',
+        'jobId': job.id,
+        'job': status
+    }), 202
+
+@app.route('/api/face/train/jobs/<job_id>', methods=['GET'])
+def api_training_job_status(job_id):
+    """Get progress (phase, images loaded, ETA) and result of a training job"""
+    job = training_jobs.queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Training job not found'}), 404
+    
+    if job.status in ('done', 'failed'):
+        return _training_job_response(job)
+    return jsonify({'success': True, 'jobId': job.id, 'job': training_jobs.queue.describe(job)})
+
+@app.route('/api/face/train/jobs', methods=['GET'])
+def api_training_jobs():
+    """List recent training jobs"""
+    jobs = [training_jobs.queue.describe(job) for job in training_jobs.queue.list()]
+    return jsonify({'success': True, 'data': jobs})
+
+# Minimum confidence score (0-100) to accept a prediction
+RECOGNITION_THRESHOLD = 60
+MAX_BATCH_IMAGES = 16
+
+# Request bodies decoded directly as an encoded image
+RAW_IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+
+def decode_image_bytes(buffer):
+    """Decode an encoded image (bytes/memoryview) into BGR without copying it"""
+    if len(buffer) == 0:
+        return None
+    with metrics.recognition_stages.time(stage='imdecode'):
+        return cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+
+def decode_image_data(image_data):
+    """Decode a (data-URL) base64 image into a BGR array, or None if invalid"""
+    with metrics.recognition_stages.time(stage='base64'):
+        image_data = image_data.split(',')[1] if ',' in image_data else image_data
+        image_bytes = base64.b64decode(image_data)
+    return decode_image_bytes(image_bytes)
+
+def _upload_buffer(file_storage):
+    # Small uploads are spooled into a BytesIO; read its buffer in place
+    stream = file_storage.stream
+    getbuffer = getattr(stream, 'getbuffer', None)
+    if getbuffer is not None:
+        return getbuffer()
+    return stream.read()
+
+def read_request_images(field, many=False):
+    """Decode the image(s) sent with the current request.
+
+    Accepts a raw image body (Content-Type image/jpeg etc.), multipart file
+    uploads named <field>, or the legacy JSON body {<field>: base64 data-URL}
+    ({<field>: [...]} when many is set). Returns a list of BGR arrays with
+    None for images that could not be decoded, or None if nothing was sent.
+    """
+    if request.mimetype in RAW_IMAGE_TYPES:
+        body = request.get_data(cache=False)
+        return [decode_image_bytes(body)] if body else None
+    
+    if request.mimetype == 'multipart/form-data':
+        files = request.files.getlist(field)
+        if not many:
+            files = files[:1]
+        return [decode_image_bytes(_upload_buffer(f)) for f in files] or None
+    
+    data = request.get_json(silent=True) or {}
+    value = data.get(field)
+    if not value:
+        return None
+    if not many:
+        value = [value]
+    elif not isinstance(value, list):
+        return None
+    
+    images = []
+    for image_data in value:
+        try:
+            images.append(decode_image_data(image_data))
+        except Exception:
+            images.append(None)
+    return images
+
+def detect_faces(gray):
+    """Detect faces, retrying with more lenient parameters; largest first"""
+    face_classifier = registry.get_cascade()
+    # Try multiple detection parameters
+    with metrics.recognition_stages.time(stage='detect'):
+        faces = face_classifier.detectMultiScale(gray, 1.1, 4, minSize=(30, 30))
+    
+    logger.debug("Faces detected: %d", len(faces))
+    
+    if len(faces) == 0:
+        # Try again with even more lenient parameters
+        metrics.detection_retries.inc()
+        with metrics.recognition_stages.time(stage='detect_retry'):
+            faces = face_classifier.detectMultiScale(gray, 1.05, 3, minSize=(20, 20))
+        logger.debug("Retry detection, faces found: %d", len(faces))
+    
+    return sorted(faces, key=lambda f: f[2] * f[3], reverse=True)
+
+def predict_face(clf, gray, face):
+    """Classify one detected face; returns (person_id, confidence_score)"""
+    x, y, w, h = face
+    face_roi = gray[y:y + h, x:x + w]
+    # Resize to match training size
+    face_roi = cv2.resize(face_roi, (200, 200))
+    with metrics.recognition_stages.time(stage='predict'):
+        person_id, distance = clf.predict(face_roi)  # person_id is now 102, not img_id
+    confidence_score = clf.confidence(distance)
+    
+    logger.debug("Predicted person_id: %s, distance: %s, score: %s%%", person_id, distance, confidence_score)
+    return person_id, confidence_score
+
+def predict_faces(clf, crops):
+    """Classify many face crops in one recognizer call; returns [(person_id, confidence_score)]"""
+    results = []
+    with metrics.recognition_stages.time(stage='predict'):
+        found = clf.search([cv2.resize(crop, (200, 200)) for crop in crops], k=1) if crops else []
+    for matches in found:
+        if not matches:
+            results.append((None, 0))
+            continue
+        person_id, distance = matches[0]
+        results.append((person_id, clf.confidence(distance)))
+    return results
+
+def get_employees_by_ids(person_ids):
+    """Look up {prs_nbr: Employee} for many ids from the in-memory directory"""
+    with metrics.recognition_stages.time(stage='lookup'):
+        return directory.get_many(person_ids)
 
 @app.route('/api/face/recognize', methods=['POST'])
 def api_recognize_face():
-    """Recognize face from base64 image"""
+    """Recognize face from an image.
+
+    The image can be posted as a raw image/jpeg body, as a multipart upload
+    named "image", or as base64 JSON {"image": "data:image/jpeg;base64,..."}.
+    """
     try:
-        data = request.json
-        image_data = data.get('image')
+        images = read_request_images('image')
         
-        if not image_data:
+        if not images:
             return jsonify({'success': False, 'message': 'No image provided'}), 400
         
-        # Check if classifier exists
-        if not os.path.exists("classifier.xml"):
+        # Get the shared classifier (reloaded automatically after retraining)
+        clf = registry.get_recognizer()
+        if clf is None:
             return jsonify({
                 'success': False,
                 'message': 'Classifier not trained yet. Please train the model first.'
             }), 400
         
-        # Decode base64 image
-        image_data = image_data.split(',')[1] if ',' in image_data else image_data
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = images[0]
+        if img is None:
+            return jsonify({'success': False, 'message': 'Invalid image'}), 400
         
-        print(f"[DEBUG] Image decoded, shape: {img.shape}")
-        
-        # Load classifier
-        clf = cv2.face.LBPHFaceRecognizer_create()
-        clf.read("classifier.xml")
+        logger.debug("Image decoded, shape: %s", img.shape)
         
         # Detect face with more lenient parameters
-        face_classifier = cv2.CascadeClassifier("resources/haarcascade_frontalface_default.xml")
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # Try multiple detection parameters
-        faces = face_classifier.detectMultiScale(gray, 1.1, 4, minSize=(30, 30))
-        
-        print(f"[DEBUG] Faces detected: {len(faces)}")
-        
-        if len(faces) == 0:
-            # Try again with even more lenient parameters
-            faces = face_classifier.detectMultiScale(gray, 1.05, 3, minSize=(20, 20))
-            print(f"[DEBUG] Retry detection, faces found: {len(faces)}")
+        faces = detect_faces(gray)
         
         if len(faces) == 0:
+            metrics.unrecognized.inc(reason='no_face')
             return jsonify({
                 'success': False,
                 'message': 'No face detected in image'
             })
         
-        # Use the largest face detected
-        faces = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)
-        
-        for (x, y, w, h) in faces[:1]:  # Only process the largest face
-            face_roi = gray[y:y + h, x:x + w]
-            # Resize to match training size
-            face_roi = cv2.resize(face_roi, (200, 200))
-            person_id, confidence = clf.predict(face_roi)  # person_id is now 102, not img_id
-            confidence_score = int(100 * (1 - confidence / 300))
-            
-            print(f"[DEBUG] Predicted person_id: {person_id}, confidence: {confidence}, score: {confidence_score}%")
+        for face in faces[:1]:  # Only process the largest face
+            person_id, confidence_score = predict_face(clf, gray, face)
             
             # Lower threshold to 60% for better recognition
-            if confidence_score > 60:
+            if confidence_score > RECOGNITION_THRESHOLD:
                 # Get employee info using person_id
-                mydb = get_db_connection()
-                mycursor = mydb.cursor()
-                mycursor.execute(
-                    """SELECT prs_nbr, prs_name, prs_skill 
-                       FROM prs_mstr 
-                       WHERE prs_nbr = %s""",
-                    (str(person_id),)
-                )
-                row = mycursor.fetchone()
-                mydb.close()
+                with metrics.recognition_stages.time(stage='lookup'):
+                    row = directory.get(person_id)
                 
                 if row:
                     return jsonify({
@@ -331,6 +513,8 @@ def api_recognize_face():
                         }
                     })
         
+        metrics.unrecognized.inc(reason='low_confidence' if confidence_score <= RECOGNITION_THRESHOLD
+                                 else 'unknown_employee')
         return jsonify({
             'success': True,
             'recognized': False,
@@ -340,6 +524,82 @@ def api_recognize_face():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/face/recognize/batch', methods=['POST'])
+def api_recognize_batch():
+    """Recognize every face in several images.
+
+    Body: {"images": ["data:image/jpeg;base64,...", ...]} or a multipart
+    upload with several "images" files. Returns one result per image, each
+    listing all detected faces with bounding box, confidence and the
+    matched employee. Employees are resolved in one pass over the cached
+    employee directory for the whole batch.
+    """
+    try:
+        images = read_request_images('images', many=True)
+        
+        if not images:
+            return jsonify({'success': False, 'message': 'No images provided'}), 400
+        if len(images) > MAX_BATCH_IMAGES:
+            return jsonify({
+                'success': False,
+                'message': f'Too many images (max {MAX_BATCH_IMAGES})'
+            }), 400
+        
+        clf = registry.get_recognizer()
+        if clf is None:
+            return jsonify({
+                'success': False,
+                'message': 'Classifier not trained yet. Please train the model first.'
+            }), 400
+        
+        results = []
+        boxes, crops = [], []
+        for index, img in enumerate(images):
+            if img is None:
+                results.append({'index': index, 'success': False, 'message': 'Invalid image', 'faces': []})
+                continue
+            
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            faces = []
+            for x, y, w, h in detect_faces(gray):
+                faces.append(len(boxes))
+                boxes.append((x, y, w, h))
+                crops.append(gray[y:y + h, x:x + w])
+            results.append({'index': index, 'success': True, 'faces': faces})
+        
+        # Classify the faces of every image in one batched call
+        predictions = predict_faces(clf, crops)
+        for result in results:
+            result['faces'] = [(boxes[i],) + predictions[i] for i in result['faces']]
+        
+        # Resolve every confident match with one query
+        matched = [f[1] for r in results for f in r['faces'] if f[2] > RECOGNITION_THRESHOLD]
+        employees = get_employees_by_ids(matched)
+        
+        for result in results:
+            faces = []
+            for (x, y, w, h), person_id, confidence_score in result['faces']:
+                row = employees.get(str(person_id)) if confidence_score > RECOGNITION_THRESHOLD else None
+                if row is None:
+                    metrics.unrecognized.inc(reason='low_confidence' if confidence_score <= RECOGNITION_THRESHOLD
+                                             else 'unknown_employee')
+                faces.append({
+                    'box': {'x': int(x), 'y': int(y), 'w': int(w), 'h': int(h)},
+                    'recognized': row is not None,
+                    'confidence': confidence_score,
+                    'employee': {
+                        'id': row[0],
+                        'name': row[1],
+                        'position': row[2]
+                    } if row else None
+                })
+            result['faces'] = faces
+        
+        return jsonify({'success': True, 'data': results})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ==================== ATTENDANCE ENDPOINTS ====================
 
 @app.route('/api/attendance/clock-in', methods=['POST'])
@@ -350,68 +610,111 @@ def api_clock_in():
     latitude = data.get('latitude')
     longitude = data.get('longitude')
     
-    mydb = get_db_connection()
-    mycursor = mydb.cursor()
+    # Get employee info from the cached directory
+    employee = directory.get(emp_id) if emp_id is not None else None
+    if not employee:
+        return jsonify({'success': False, 'message': 'Employee not found'}), 404
     
     try:
-        # Get employee info
-        mycursor.execute(
-            "SELECT prs_name, prs_skill FROM prs_mstr WHERE prs_nbr = %s",
-            (emp_id,)
-        )
-        emp = mycursor.fetchone()
+        # Written together with concurrent clock-ins by the attendance writer
+        clock_in = attendance_writer.ClockIn(employee, datetime.now(), latitude, longitude)
+        result = attendance_writer.writer.submit(clock_in).result(attendance_writer.RESULT_TIMEOUT)
         
-        if not emp:
-            mydb.close()
-            return jsonify({'success': False, 'message': 'Employee not found'}), 404
-        
-        # Check if already checked in today
-        mycursor.execute(
-            """SELECT id, waktu FROM absensi 
-               WHERE person = %s AND tanggal = CURDATE()""",
-            (emp_id,)
-        )
-        existing = mycursor.fetchone()
-        
-        if existing:
-            mydb.close()
+        if result['status'] == 'duplicate':
             return jsonify({
                 'success': False, 
-                'message': f'Anda sudah check-in hari ini pada {existing[1]}',
+                'message': f"Anda sudah check-in hari ini pada {result['time']}",
                 'already_checked_in': True,
-                'check_in_time': existing[1]
+                'check_in_time': result['time']
             }), 400
         
-        # Record attendance
+        return jsonify({
+            'success': True,
+            'message': 'Attendance recorded successfully',
+            'data': {
+                'employeeId': result['employeeId'],
+                'name': result['name'],
+                'position': result['position'],
+                'time': result['time'],
+                'date': result['date']
+            }
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/attendance/clock-in/bulk', methods=['POST'])
+def api_clock_in_bulk():
+    """Clock in many employees at once, e.g. a kiosk replaying its offline queue.
+    
+    Body: {"items": [{employeeId, latitude, longitude, clientTime?, idempotencyKey?}]}
+    Every item gets its own result; the one-check-in-per-day rule still holds.
+    """
+    data = request.json or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'items must be a non-empty list'}), 400
+    if len(items) > attendance_writer.BULK_MAX_ITEMS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {attendance_writer.BULK_MAX_ITEMS} items per request'
+        }), 400
+    
+    try:
         now = datetime.now()
-        mycursor.execute(
-            """INSERT INTO absensi (person, nama, skill, tanggal, waktu, latitude, longitude) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-            (emp_id, emp[0], emp[1], now.date(), now.strftime('%H:%M:%S'), latitude, longitude)
+        employees = directory.get_many(
+            item.get('employeeId') for item in items
+            if isinstance(item, dict) and item.get('employeeId') is not None
         )
         
-        # Also record in accs_hist
-        mycursor.execute(
-            "INSERT INTO accs_hist (accs_date, accs_prsn) VALUES (%s, %s)",
-            (now.date(), emp_id)
-        )
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'success': False, 'status': 'invalid',
+                                  'message': 'Item must be an object'}
+                continue
+            base = {'index': index, 'idempotencyKey': item.get('idempotencyKey')}
+            employee = employees.get(str(item.get('employeeId')))
+            if employee is None:
+                results[index] = dict(base, success=False, status='not_found',
+                                      message='Employee not found')
+                continue
+            try:
+                when = now
+                if item.get('clientTime'):
+                    when = attendance_writer.parse_client_time(item['clientTime'], now)
+            except ValueError as e:
+                results[index] = dict(base, success=False, status='invalid', message=str(e))
+                continue
+            clock_in = attendance_writer.ClockIn(
+                employee, when, item.get('latitude'), item.get('longitude'),
+                key=item.get('idempotencyKey')
+            )
+            pending.append((index, base, attendance_writer.writer.submit(clock_in)))
         
-        mydb.commit()
-        mydb.close()
+        for index, base, future in pending:
+            try:
+                result = future.result(attendance_writer.RESULT_TIMEOUT)
+            except Exception as e:
+                results[index] = dict(base, success=False, status='error', message=str(e))
+                continue
+            recorded = result['status'] == 'recorded'
+            results[index] = dict(
+                base, **result,
+                success=recorded,
+                message='Attendance recorded successfully' if recorded
+                        else f"Sudah check-in pada {result['date']} {result['time']}"
+            )
         
         return jsonify({
             'success': True,
-            'message': 'Attendance recorded successfully',
-            'data': {
-                'employeeId': emp_id,
-                'name': emp[0],
-                'position': emp[1],
-                'time': now.strftime('%H:%M:%S'),
-                'date': now.date().isoformat()
+            'data': results,
+            'summary': {
+                status: sum(1 for r in results if r['status'] == status)
+                for status in ('recorded', 'duplicate', 'not_found', 'invalid', 'error')
             }
         })
     except Exception as e:
-        mydb.close()
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/api/attendance/today', methods=['GET'])
@@ -421,18 +724,18 @@ def api_attendance_today():
     mycursor = mydb.cursor()
     
     mycursor.execute(
-        """SELECT a.id, a.person, a.nama, a.skill, a.tanggal, a.waktu, a.latitude, a.longitude
+        """SELECT a.id, a.person, a.nama, a.skill, a.tanggal, a.waktu, a.latitude, a.longitude,
+                  a.jam < '09:00:00'
            FROM absensi a
            WHERE a.tanggal = CURDATE()
-           ORDER BY a.waktu DESC"""
+           ORDER BY a.jam DESC"""
     )
     attendance = mycursor.fetchall()
     
     result = []
     for att in attendance:
         # Determine status (on-time if before 9 AM)
-        time_obj = datetime.strptime(att[5], '%H:%M:%S').time()
-        status = 'on-time' if time_obj.hour < 9 else 'late'
+        status = 'on-time' if att[8] else 'late'
         
         result.append({
             'id': att[0],
@@ -453,31 +756,73 @@ def api_attendance_today():
 
 @app.route('/api/attendance/history', methods=['GET'])
 def api_attendance_history():
-    """Get attendance history"""
+    """Get attendance history, newest first.
+    
+    Query: employeeId, from, to (YYYY-MM-DD), limit (default 100) and
+    cursor (the nextCursor of the previous page).
+    """
+    try:
+        filters = attendance_history.parse_filters(request.args)
+        limit = request.args.get('limit', attendance_history.DEFAULT_LIMIT, type=int)
+        if not 1 <= limit <= attendance_history.MAX_LIMIT:
+            raise ValueError(f'limit must be between 1 and {attendance_history.MAX_LIMIT}')
+        after = request.args.get('cursor')
+        after = attendance_history.decode_cursor(after) if after else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
     mydb = get_db_connection()
-    mycursor = mydb.cursor()
+    try:
+        rows, next_cursor = attendance_history.page(mydb.cursor(), filters, limit, after)
+    finally:
+        mydb.close()
     
-    mycursor.execute(
-        """SELECT a.id, a.person, a.nama, a.skill, a.tanggal, a.waktu
-           FROM absensi a
-           ORDER BY a.tanggal DESC, a.waktu DESC
-           LIMIT 100"""
-    )
-    attendance = mycursor.fetchall()
+    return jsonify({
+        'success': True,
+        'data': [attendance_history.to_dict(row) for row in rows],
+        'nextCursor': next_cursor,
+        'hasMore': next_cursor is not None
+    })
+
+@app.route('/api/attendance/export', methods=['GET'])
+def api_attendance_export():
+    """Stream attendance rows as CSV (default) or NDJSON (?format=ndjson).
     
-    result = []
-    for att in attendance:
-        result.append({
-            'id': att[0],
-            'employeeId': att[1],
-            'employeeName': att[2],
-            'department': att[3],
-            'date': att[4].isoformat() if att[4] else None,
-            'clockIn': att[5]
-        })
+    Same filters as the history endpoint, oldest first, without a limit.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': "format must be 'csv' or 'ndjson'"}), 400
+    try:
+        filters = attendance_history.parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    mydb.close()
-    return jsonify({'success': True, 'data': result})
+    batches = attendance_history.export_rows(get_db_connection(), filters)
+    if fmt == 'csv':
+        body, mimetype = attendance_history.export_csv(batches), 'text/csv'
+    else:
+        body, mimetype = attendance_history.export_ndjson(batches), 'application/x-ndjson'
+    filename = f"attendance-{date.today().strftime('%Y%m%d')}.{fmt}"
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/api/attendance/stream', methods=['GET'])
+def api_attendance_stream():
+    """Live attendance feed as Server-Sent Events.
+    
+    Events: clock-in (same fields as /attendance/today), stats (same as
+    /dashboard/stats), deleted, access (face confirmed on the live stream)
+    and reset (reload /attendance/today and /dashboard/stats). Browsers
+    resume with the Last-Event-ID header automatically; ?lastEventId= does
+    the same for clients that cannot set headers.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(
+        events.bus.subscribe(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/attendance/<int:id>', methods=['DELETE'])
 def api_delete_attendance(id):
@@ -486,8 +831,15 @@ def api_delete_attendance(id):
     mycursor = mydb.cursor()
     
     try:
-        mycursor.execute("DELETE FROM absensi WHERE id = %s", (id,))
+        mycursor.execute("SELECT tanggal, jam, person FROM absensi WHERE id = %s FOR UPDATE", (id,))
+        row = mycursor.fetchone()
+        if row:
+            mycursor.execute("DELETE FROM absensi WHERE id = %s", (id,))
+            attendance_rollup.remove(mycursor, row[0], row[1])
         mydb.commit()
+        if row:
+            events.bus.publish('deleted', {'id': id, 'employeeId': row[2], 'date': row[0].isoformat()})
+            events.bus.publish('stats', attendance_rollup.today_stats(mycursor))
         mydb.close()
         
         return jsonify({'success': True, 'message': 'Attendance deleted'})
@@ -496,42 +848,19 @@ def api_delete_attendance(id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 # ==================== DASHBOARD ENDPOINTS ====================
+# All read the absensi_daily rollup (see attendance_rollup.py) instead of
+# aggregating absensi on every refresh
 
 @app.route('/api/dashboard/stats', methods=['GET'])
 def api_dashboard_stats():
     """Get dashboard statistics"""
     mydb = get_db_connection()
-    mycursor = mydb.cursor()
-    
-    # Total employees
-    mycursor.execute("SELECT COUNT(*) FROM prs_mstr WHERE prs_active = 'Y'")
-    total_employees = mycursor.fetchone()[0]
-    
-    # Today's attendance (count unique persons)
-    mycursor.execute("SELECT COUNT(DISTINCT person) FROM absensi WHERE tanggal = CURDATE()")
-    today_present = mycursor.fetchone()[0]
-    
-    # Late arrivals (unique persons who came after 9 AM)
-    mycursor.execute(
-        """SELECT COUNT(DISTINCT person) FROM absensi 
-           WHERE tanggal = CURDATE() AND TIME(waktu) > '09:00:00'"""
-    )
-    late_arrivals = mycursor.fetchone()[0]
-    
-    # Absent today
-    absent_today = max(0, total_employees - today_present)
-    
-    mydb.close()
+    try:
+        stats = attendance_rollup.today_stats(mydb.cursor())
+    finally:
+        mydb.close()
     
-    return jsonify({
-        'success': True,
-        'data': {
-            'totalEmployees': total_employees,
-            'todayPresent': today_present,
-            'lateArrivals': late_arrivals,
-            'absentToday': absent_today
-        }
-    })
+    return jsonify({'success': True, 'data': stats})
 
 @app.route('/api/dashboard/weekly', methods=['GET'])
 def api_weekly_attendance():
@@ -540,13 +869,9 @@ def api_weekly_attendance():
     mycursor = mydb.cursor()
     
     mycursor.execute("""
-        SELECT 
-            DAYNAME(tanggal) as day,
-            COUNT(*) as present,
-            SUM(CASE WHEN TIME(waktu) > '09:00:00' THEN 1 ELSE 0 END) as late
-        FROM absensi
-        WHERE tanggal >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-        GROUP BY tanggal, DAYNAME(tanggal)
+        SELECT DAYNAME(tanggal) as day, present, late
+        FROM absensi_daily
+        WHERE tanggal >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) AND present > 0
         ORDER BY tanggal
     """)
     
@@ -565,18 +890,19 @@ def api_weekly_attendance():
 
 @app.route('/api/dashboard/monthly', methods=['GET'])
 def api_monthly_trend():
-    """Get monthly attendance trend"""
+    """Get monthly attendance trend (check-ins / active headcount over the days with check-ins)"""
     mydb = get_db_connection()
     mycursor = mydb.cursor()
     
     mycursor.execute("""
         SELECT 
-            DATE_FORMAT(tanggal, '%b') as month,
-            COUNT(*) * 100.0 / (SELECT COUNT(*) FROM prs_mstr WHERE prs_active = 'Y') as rate
-        FROM absensi
-        WHERE tanggal >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
+            DATE_FORMAT(MIN(tanggal), '%b') as month,
+            SUM(present) * 100.0 / SUM(headcount) as rate
+        FROM absensi_daily
+        WHERE tanggal >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH) AND present > 0
         GROUP BY YEAR(tanggal), MONTH(tanggal)
-        ORDER BY tanggal
+        HAVING SUM(headcount) > 0
+        ORDER BY YEAR(tanggal), MONTH(tanggal)
     """)
     
     monthly_data = mycursor.fetchall()
@@ -593,111 +919,54 @@ def api_monthly_trend():
 
 # ==================== VIDEO STREAMING ====================
 
+def _insert_stream_access(nbr):
+    mydb = get_db_connection()
+    mycursor = mydb.cursor()
+    try:
+        mycursor.execute(
+            "INSERT INTO accs_hist (accs_date, accs_prsn) VALUES (%s, %s)",
+            (str(date.today()), nbr)
+        )
+        mydb.commit()
+    except Exception as e:
+        logger.error("Failed to record access for %s: %s", nbr, e)
+    finally:
+        mydb.close()
+
+# Writes for the live stream run here so the frame loop never waits on MySQL
+_stream_access_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream-access')
+
+def record_stream_access(person_id):
+    """Queue the accs_hist row for a face confirmed on the live stream"""
+    employee = directory.get(person_id)
+    if employee is not None:
+        _stream_access_writer.submit(_insert_stream_access, employee.nbr)
+        events.bus.publish('access', {
+            'employeeId': employee.nbr,
+            'employeeName': employee.name,
+            'department': employee.skill,
+            'time': datetime.now().strftime('%H:%M:%S')
+        })
+
+def make_stream_recognizer():
+    """Build the per-camera frame processor for the recognition stream"""
+    return LiveRecognizer(
+        registry.get_recognizer,
+        registry.get_cascade,
+        directory.get,
+        on_confirm=record_stream_access
+    )
+
 def face_recognition_stream():
-    """Generate frame by frame from camera for face recognition"""
-    global justscanned, pause_cnt, cnt
-    
-    def draw_boundary(img, classifier, scaleFactor, minNeighbors, color, text, clf):
-        global justscanned, pause_cnt, cnt
-        
-        gray_image = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        features = classifier.detectMultiScale(gray_image, scaleFactor, minNeighbors)
-        
-        pause_cnt += 1
-        coords = []
-        
-        for (x, y, w, h) in features:
-            cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
-            person_id, pred = clf.predict(gray_image[y:y + h, x:x + w])  # person_id is now 102
-            confidence = int(100 * (1 - pred / 300))
-            
-            if confidence > 70 and not justscanned:
-                cnt += 1
-                n = (100 / 30) * cnt
-                w_filled = (cnt / 30) * w
-                
-                cv2.putText(img, str(int(n))+' %', (x + 20, y + h + 28), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
-                
-                cv2.rectangle(img, (x, y + h + 40), (x + w, y + h + 50), color, 2)
-                cv2.rectangle(img, (x, y + h + 40), (x + int(w_filled), y + h + 50), 
-                             (255, 255, 255), cv2.FILLED)
-                
-                mydb = get_db_connection()
-                mycursor = mydb.cursor()
-                # Query using person_id directly
-                mycursor.execute(
-                    """SELECT prs_nbr, prs_name, prs_skill 
-                       FROM prs_mstr 
-                       WHERE prs_nbr = %s""",
-                    (str(person_id),)
-                )
-                row = mycursor.fetchone()
-                
-                if row:
-                    pnbr = row[0]
-                    pname = row[1]
-                    pskill = row[2]
-                    
-                    if int(cnt) == 30:
-                        cnt = 0
-                        mycursor.execute(
-                            "INSERT INTO accs_hist (accs_date, accs_prsn) VALUES (%s, %s)",
-                            (str(date.today()), pnbr)
-                        )
-                        mydb.commit()
-                        
-                        cv2.putText(img, pname + ' | ' + pskill, (x - 10, y - 10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (153, 255, 255), 2, cv2.LINE_AA)
-                        time.sleep(1)
-                        
-                        justscanned = True
-                        pause_cnt = 0
-                else:
-                    cv2.putText(img, 'UNKNOWN', (x, y - 5), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)
-                    cnt = 0
-                
-                mydb.close()
-            else:
-                if not justscanned:
-                    cv2.putText(img, 'UNKNOWN', (x, y - 5), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)
-                
-                if pause_cnt > 80:
-                    justscanned = False
-            
-            coords = [x, y, w, h]
-        
-        return coords
-    
-    def recognize(img, clf, faceCascade):
-        coords = draw_boundary(img, faceCascade, 1.1, 10, (0, 0, 255), "Face", clf)
-        return img
-    
-    faceCascade = cv2.CascadeClassifier("resources/haarcascade_frontalface_default.xml")
-    clf = cv2.face.LBPHFaceRecognizer_create()
-    clf.read("classifier.xml")
-    
-    cap = cv2.VideoCapture(0)
-    cap.set(3, 400)
-    cap.set(4, 400)
-    
-    while True:
-        ret, img = cap.read()
-        if not ret:
-            break
-        
-        img = recognize(img, clf, faceCascade)
-        
-        frame = cv2.imencode('.jpg', img)[1].tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
-        
-        if cv2.waitKey(1) == 27:
-            break
-    
-    cap.release()
+    """Generate frame by frame from the shared recognition pipeline.
+
+    A single capture thread per camera and a single processing thread run
+    recognition at a fixed rate; every client just receives the latest
+    annotated JPEG, so extra viewers neither fight over the device nor
+    add detection work.
+    """
+    processor = camera.get_processor('recognition', make_stream_recognizer)
+    return camera.mjpeg(processor.subscribe())
 
 @app.route('/api/video/recognition')
 def api_video_recognition():
@@ -707,6 +976,47 @@ def api_video_recognition():
         mimetype='multipart/x-mixed-replace; boundary=frame'
     )
 
+@app.route('/api/video/recognition/stats', methods=['GET'])
+def api_video_recognition_stats():
+    """Per-stage timings of the recognition stream, for tuning STREAM_DETECT_EVERY"""
+    return jsonify({
+        'success': True,
+        'data': camera.processor_stats('recognition')
+    })
+
+# ==================== METRICS ====================
+
+def _stream_stage_seconds():
+    values = {}
+    for stats in camera.processor_stats('recognition'):
+        stages = dict(stats['stages'], **stats.get('pipeline', {}).get('stages', {}))
+        for stage, timing in stages.items():
+            values[(stats['name'], stage)] = timing['avg_ms'] / 1000
+    return values
+
+metrics.Callback('db_pool_connects_total', 'MySQL connections opened by the pool',
+                 lambda: db.pool.stats()['connects'], type='counter')
+metrics.Callback('db_pool_checkouts_total', 'Connections borrowed from the pool',
+                 lambda: db.pool.stats()['checkouts'], type='counter')
+metrics.Callback('db_pool_timeouts_total', 'Checkouts that gave up waiting for a free connection',
+                 lambda: db.pool.stats()['timeouts'], type='counter')
+metrics.Callback('db_pool_in_use', 'Connections currently borrowed', lambda: db.pool.stats()['in_use'])
+metrics.Callback('db_pool_idle', 'Idle connections kept open', lambda: db.pool.stats()['idle'])
+metrics.Callback('attendance_clock_ins_total', 'Clock-ins handled by the attendance writer, by outcome',
+                 lambda: {(k,): v for k, v in attendance_writer.writer.stats.items() if k != 'batches'},
+                 labelnames=('outcome',), type='counter')
+metrics.Callback('attendance_batches_total', 'Transactions written by the attendance writer',
+                 lambda: attendance_writer.writer.stats['batches'], type='counter')
+metrics.Callback('attendance_stream_subscribers', 'Open /api/attendance/stream connections',
+                 lambda: events.bus.stats()['subscribers'])
+metrics.Callback('stream_stage_avg_seconds', 'Moving average time per recognition stream stage',
+                 _stream_stage_seconds, labelnames=('processor', 'stage'))
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Prometheus text-format metrics for this process"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # ==================== HEALTH CHECK ====================
 
 @app.route('/api/health', methods=['GET'])
@@ -714,7 +1024,12 @@ def health_check():
     return jsonify({
         'success': True,
         'message': 'API is running',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'model': registry.info(),
+        'db_pool': db.pool.stats(),
+        'employees': directory.info(),
+        'attendance_writer': attendance_writer.writer.stats,
+        'events': events.bus.stats()
     })
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+import io
+import csv
+import json
+import base64
+from datetime import date, timedelta
+
+# Page size for GET /api/attendance/history
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Rows fetched from the server-side cursor per export chunk
+EXPORT_BATCH = 1000
+
+COLUMNS = "id, person, nama, skill, tanggal, waktu, jam, latitude, longitude"
+EXPORT_FIELDS = ['id', 'employeeId', 'employeeName', 'department', 'date', 'clockIn',
+                 'latitude', 'longitude']
+
+
+def _time_str(value):
+    """'HH:MM:SS' for the timedelta mysql-connector returns for TIME columns"""
+    if value is None or isinstance(value, str):
+        return value
+    seconds = int(value.total_seconds()) if isinstance(value, timedelta) else (
+        value.hour * 3600 + value.minute * 60 + value.second)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past `row` (a COLUMNS row)"""
+    key = [row[4].isoformat(), _time_str(row[6]), row[0]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """(date, 'HH:MM:SS' or None, id); raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        day, at, row_id = json.loads(raw)
+        return date.fromisoformat(day), at, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_filters(args):
+    """employeeId / from / to query args; raises ValueError for bad dates"""
+    filters = {'employeeId': args.get('employeeId') or None, 'from': None, 'to': None}
+    for name in ('from', 'to'):
+        if args.get(name):
+            try:
+                filters[name] = date.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+    return filters
+
+
+def _where(filters, after=None):
+    clauses, params = [], []
+    if filters.get('employeeId') is not None:
+        clauses.append("person = %s")
+        params.append(str(filters['employeeId']))
+    if filters.get('from'):
+        clauses.append("tanggal >= %s")
+        params.append(filters['from'])
+    if filters.get('to'):
+        clauses.append("tanggal <= %s")
+        params.append(filters['to'])
+    if after is not None:
+        # Rows after the cursor in (tanggal, jam, id) DESC order. The leading
+        # tanggal <= bound keeps it an index range scan; jam NULL (legacy
+        # rows that could not be backfilled) sorts last within a day.
+        day, at, row_id = after
+        if at is None:
+            clauses.append("tanggal <= %s AND (tanggal < %s OR (jam IS NULL AND id < %s))")
+            params += [day, day, row_id]
+        else:
+            clauses.append("tanggal <= %s AND (tanggal < %s OR jam < %s OR jam IS NULL"
+                           " OR (jam = %s AND id < %s))")
+            params += [day, day, at, at, row_id]
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def page(cursor, filters, limit=DEFAULT_LIMIT, after=None):
+    """One page, newest first; returns (rows, next_cursor or None)"""
+    where, params = _where(filters, after)
+    cursor.execute(
+        f"SELECT {COLUMNS} FROM absensi{where} ORDER BY tanggal DESC, jam DESC, id DESC LIMIT %s",
+        params + [limit + 1]
+    )
+    rows = cursor.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def to_dict(row):
+    return {
+        'id': row[0],
+        'employeeId': row[1],
+        'employeeName': row[2],
+        'department': row[3],
+        'date': row[4].isoformat() if row[4] else None,
+        'clockIn': row[5],
+        'latitude': row[7],
+        'longitude': row[8]
+    }
+
+
+def export_rows(conn, filters):
+    """Yield matching rows oldest first, EXPORT_BATCH at a time.
+
+    The cursor is unbuffered, so rows stream from the server instead of
+    being loaded into memory; the connection is released when the
+    generator finishes or is closed (client disconnect).
+    """
+    try:
+        cursor = conn.cursor(buffered=False)
+        where, params = _where(filters)
+        cursor.execute(f"SELECT {COLUMNS} FROM absensi{where} ORDER BY tanggal, jam, id", params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def export_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(to_dict(row) for row in rows)
+        yield buffer.getvalue()
+
+
+def export_ndjson(batches):
+    for rows in batches:
+        yield ''.join(json.dumps(to_dict(row)) + '\n' for row in rows)
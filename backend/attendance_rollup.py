@@ -0,0 +1,133 @@
+"""Maintain absensi_daily, the per-day attendance summary the dashboard reads.
+
+One row per date with the number of check-ins (present), how many of them
+were after LATE_AFTER (late) and the active headcount. The attendance
+writer adds to it in the same transaction as the absensi rows, deleting a
+check-in subtracts from it, so the dashboard never aggregates absensi.
+Rebuild it from absensi after editing rows by hand. Run from the backend
+directory:
+
+    python attendance_rollup.py [--from 2024-01-01] [--to 2024-12-31]
+"""
+import sys
+import logging
+import argparse
+from datetime import time, timedelta
+from collections import OrderedDict
+
+import db
+from employee_directory import directory
+
+logger = logging.getLogger(__name__)
+
+# Check-ins after this time count as late
+LATE_AFTER = time(9, 0, 0)
+
+ACTIVE_HEADCOUNT_SQL = "(SELECT COUNT(*) FROM prs_mstr WHERE prs_active = 'Y')"
+
+
+def is_late(value):
+    """Whether a check-in time (time, or the timedelta MySQL returns for TIME) is late"""
+    if value is None:
+        return False
+    if isinstance(value, timedelta):
+        return value > timedelta(hours=LATE_AFTER.hour, minutes=LATE_AFTER.minute,
+                                 seconds=LATE_AFTER.second)
+    return value.replace(microsecond=0) > LATE_AFTER
+
+
+def active_headcount():
+    return sum(1 for e in directory.all() if e.active == 'Y')
+
+
+def today_stats(cursor):
+    """Dashboard counters for today, as returned by /api/dashboard/stats"""
+    total_employees = active_headcount()
+    cursor.execute("SELECT present, late FROM absensi_daily WHERE tanggal = CURDATE()")
+    row = cursor.fetchone()
+    today_present, late_arrivals = row if row else (0, 0)
+    return {
+        'totalEmployees': total_employees,
+        'todayPresent': today_present,
+        'lateArrivals': late_arrivals,
+        'absentToday': max(0, total_employees - today_present)
+    }
+
+
+def add(cursor, check_ins):
+    """Count new check-ins, given as [(date, time)], in the current transaction.
+
+    The headcount of today's row follows the directory; rows for earlier
+    days (offline replays) keep the headcount they were created with.
+    """
+    days = OrderedDict()
+    for day, at in sorted(check_ins):
+        present, late = days.get(day, (0, 0))
+        days[day] = (present + 1, late + is_late(at))
+    if not days:
+        return
+    headcount = active_headcount()
+    cursor.execute(
+        "INSERT INTO absensi_daily (tanggal, present, late, headcount) VALUES "
+        + ", ".join(["(%s, %s, %s, %s)"] * len(days))
+        + " ON DUPLICATE KEY UPDATE present = present + VALUES(present),"
+          " late = late + VALUES(late),"
+          " headcount = IF(tanggal = CURDATE(), VALUES(headcount), headcount)",
+        [value for day, (present, late) in days.items() for value in (day, present, late, headcount)]
+    )
+
+
+def remove(cursor, day, at):
+    """Uncount a deleted check-in in the current transaction"""
+    cursor.execute(
+        "UPDATE absensi_daily SET present = GREATEST(present - 1, 0), late = GREATEST(late - %s, 0)"
+        " WHERE tanggal = %s",
+        (int(is_late(at)), day)
+    )
+
+
+def rebuild(conn, start=None, end=None):
+    """Recompute present/late for [start, end] from absensi; returns the days written.
+
+    Existing headcounts are kept; days that had no row get today's active
+    headcount.
+    """
+    start = start or '1000-01-01'
+    end = end or '9999-12-31'
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE absensi_daily SET present = 0, late = 0 WHERE tanggal BETWEEN %s AND %s",
+        (start, end)
+    )
+    cursor.execute(
+        "INSERT INTO absensi_daily (tanggal, present, late, headcount)"
+        f" SELECT tanggal, COUNT(*), SUM(jam > %s), {ACTIVE_HEADCOUNT_SQL}"
+        " FROM absensi WHERE tanggal BETWEEN %s AND %s GROUP BY tanggal"
+        " ON DUPLICATE KEY UPDATE present = VALUES(present), late = VALUES(late)",
+        (LATE_AFTER.strftime('%H:%M:%S'), start, end)
+    )
+    cursor.execute("SELECT COUNT(*) FROM absensi_daily WHERE tanggal BETWEEN %s AND %s AND present > 0",
+                   (start, end))
+    days = cursor.fetchone()[0]
+    conn.commit()
+    return days
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--from', dest='start', help='first date to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', help='last date to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    conn = db.get_connection()
+    try:
+        days = rebuild(conn, args.start, args.end)
+    finally:
+        conn.close()
+    print(f"Rebuilt absensi_daily: {days} day(s) with check-ins")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
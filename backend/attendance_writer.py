@@ -0,0 +1,268 @@
+import os
+import time
+import queue
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from concurrent.futures import Future
+
+import attendance_rollup
+import db
+import events
+
+logger = logging.getLogger(__name__)
+
+# How long the writer waits for more clock-ins before flushing a batch
+FLUSH_INTERVAL = float(os.environ.get('ATTENDANCE_FLUSH_MS', 20)) / 1000
+# Most clock-ins written in one transaction
+MAX_BATCH = int(os.environ.get('ATTENDANCE_MAX_BATCH', 500))
+# Idempotency keys remembered for replayed requests
+MAX_REMEMBERED_KEYS = 10000
+# Seconds a request waits for its batch to be written
+RESULT_TIMEOUT = 10
+# Bulk clock-in limits: items per request, how far a kiosk clock may run
+# ahead of the server, and how old a queued offline clock-in may be
+BULK_MAX_ITEMS = int(os.environ.get('ATTENDANCE_BULK_MAX_ITEMS', 500))
+MAX_CLOCK_SKEW = timedelta(seconds=int(os.environ.get('ATTENDANCE_MAX_CLOCK_SKEW', 300)))
+MAX_REPLAY_AGE = timedelta(hours=int(os.environ.get('ATTENDANCE_MAX_REPLAY_HOURS', 72)))
+
+INSERT_ABSENSI = "INSERT IGNORE INTO absensi (person, nama, skill, tanggal, waktu, jam, latitude, longitude) VALUES "
+ABSENSI_ROW = "(%s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+class ClockIn:
+    """One pending clock-in; `future` resolves to a result dict"""
+
+    def __init__(self, employee, when, latitude=None, longitude=None, key=None):
+        self.employee = employee
+        self.when = when
+        self.latitude = latitude
+        self.longitude = longitude
+        self.key = key
+        self.future = Future()
+
+    @property
+    def slot(self):
+        return (self.employee.nbr, self.when.date())
+
+
+def parse_client_time(value, now):
+    """Local naive datetime for a kiosk's ISO 8601 clientTime.
+
+    Raises ValueError when it cannot be parsed, is ahead of the server by
+    more than MAX_CLOCK_SKEW, or is older than MAX_REPLAY_AGE.
+    """
+    when = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    if when > now + MAX_CLOCK_SKEW:
+        raise ValueError('clientTime is in the future')
+    if when < now - MAX_REPLAY_AGE:
+        raise ValueError('clientTime is too old to replay')
+    return when
+
+
+def clock_in_event(clock_in):
+    """Live feed payload, shaped like an /api/attendance/today entry"""
+    return {
+        'employeeId': clock_in.employee.nbr,
+        'employeeName': clock_in.employee.name,
+        'department': clock_in.employee.skill,
+        'date': clock_in.when.date().isoformat(),
+        'clockIn': clock_in.when.strftime('%H:%M:%S'),
+        'status': 'on-time' if clock_in.when.time().replace(microsecond=0) < attendance_rollup.LATE_AFTER else 'late',
+        'latitude': clock_in.latitude,
+        'longitude': clock_in.longitude
+    }
+
+
+def _result(status, employee, when):
+    return {
+        'status': status,
+        'employeeId': employee.nbr,
+        'name': employee.name,
+        'position': employee.skill,
+        'date': when.date().isoformat(),
+        'time': when.strftime('%H:%M:%S')
+    }
+
+
+class AttendanceWriter:
+    """Batches clock-ins from all requests into few transactions.
+
+    Requests hand a ClockIn to submit() and wait on its future. A single
+    writer thread collects whatever arrives within FLUSH_INTERVAL (up to
+    MAX_BATCH), then for the whole batch: keeps the earliest clock-in per
+    (person, date), looks up existing check-ins with one query, and writes
+    the new absensi and accs_hist rows as two multi-row INSERTs in one
+    transaction, together with the absensi_daily counters. The unique
+    (person, tanggal) key on absensi makes the rule hold across processes
+    as well. Each future gets status 'recorded' or 'duplicate' (with the
+    time of the check-in that counts). Results are remembered by
+    idempotency key so a kiosk replaying its offline queue gets the same
+    answer again.
+    """
+
+    def __init__(self, connect=db.get_connection, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self._connect = connect
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._keys = OrderedDict()
+        self.stats = {'batches': 0, 'recorded': 0, 'duplicates': 0, 'conflicts': 0, 'errors': 0}
+
+    def submit(self, clock_in):
+        if clock_in.key is not None:
+            with self._lock:
+                remembered = self._keys.get(clock_in.key)
+            if remembered is not None:
+                clock_in.future.set_result(dict(remembered, replayed=True))
+                return clock_in.future
+        self._ensure_worker()
+        self._queue.put(clock_in)
+        return clock_in.future
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            except Exception as e:
+                logger.exception("Attendance batch of %d failed", len(batch))
+                self.stats['errors'] += len(batch)
+                for clock_in in batch:
+                    if not clock_in.future.done():
+                        clock_in.future.set_exception(e)
+
+    def _existing(self, cursor, slots):
+        """{(person, date): waktu} for slots that already have a check-in"""
+        if not slots:
+            return {}
+        placeholders = ", ".join(["(%s, %s)"] * len(slots))
+        params = [value for slot in slots for value in slot]
+        cursor.execute(
+            f"SELECT person, tanggal, waktu FROM absensi WHERE (person, tanggal) IN ({placeholders})",
+            params
+        )
+        return {(str(person), tanggal): waktu for person, tanggal, waktu in cursor.fetchall()}
+
+    def _flush(self, batch):
+        # Earliest clock-in wins within the batch (matters for offline replays)
+        batch.sort(key=lambda c: c.when)
+        winners, losers = OrderedDict(), []
+        for clock_in in batch:
+            if clock_in.slot in winners:
+                losers.append(clock_in)
+            else:
+                winners[clock_in.slot] = clock_in
+
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            existing = self._existing(cursor, list(winners))
+            new = [c for slot, c in winners.items() if slot not in existing]
+            if new:
+                lost = self._insert(conn, cursor, new)
+                if lost:
+                    existing.update(self._existing(cursor, [c.slot for c in lost]))
+            conn.commit()
+            recorded = [c for c in new if c.slot not in existing]
+            stats = attendance_rollup.today_stats(cursor) if recorded else None
+        finally:
+            conn.close()
+
+        self.stats['batches'] += 1
+        for slot, clock_in in winners.items():
+            if slot in existing:
+                self._finish(clock_in, 'duplicate', existing[slot])
+            else:
+                self._finish(clock_in, 'recorded')
+        for clock_in in losers:
+            winner = winners[clock_in.slot]
+            if clock_in.key is not None and clock_in.key == winner.key:
+                # The same request replayed while the first was still queued
+                clock_in.future.set_result(dict(winner.future.result(), replayed=True))
+                continue
+            winner_time = existing.get(clock_in.slot) or winner.when.strftime('%H:%M:%S')
+            self._finish(clock_in, 'duplicate', winner_time)
+
+        for clock_in in recorded:
+            events.bus.publish('clock-in', clock_in_event(clock_in))
+        if stats is not None:
+            events.bus.publish('stats', stats)
+
+    def _insert(self, conn, cursor, clock_ins):
+        """Write absensi and accs_hist rows; returns the clock-ins that lost a race.
+
+        The unique (person, tanggal) key is the real guard: rows are written
+        with INSERT IGNORE, so a check-in committed by another process since
+        _existing() ran is skipped instead of duplicated. If the multi-row
+        insert skipped anything, it is rolled back and redone row by row to
+        find out which clock-ins were skipped.
+        """
+        cursor.execute(
+            INSERT_ABSENSI + ", ".join([ABSENSI_ROW] * len(clock_ins)),
+            [value for c in clock_ins for value in self._row(c)]
+        )
+        lost = []
+        if cursor.rowcount != len(clock_ins):
+            conn.rollback()
+            inserted = []
+            for c in clock_ins:
+                cursor.execute(
+                    INSERT_ABSENSI + ABSENSI_ROW,
+                    self._row(c)
+                )
+                (inserted if cursor.rowcount == 1 else lost).append(c)
+            clock_ins = inserted
+            self.stats['conflicts'] += len(lost)
+        if clock_ins:
+            cursor.execute(
+                "INSERT INTO accs_hist (accs_date, accs_prsn) VALUES " + ", ".join(["(%s, %s)"] * len(clock_ins)),
+                [value for c in clock_ins for value in (c.when.date(), c.employee.nbr)]
+            )
+            attendance_rollup.add(cursor, [(c.when.date(), c.when.time()) for c in clock_ins])
+        return lost
+
+    @staticmethod
+    def _row(c):
+        # waktu (varchar) is kept for display, jam (TIME) is what reports query
+        return (c.employee.nbr, c.employee.name, c.employee.skill, c.when.date(),
+                c.when.strftime('%H:%M:%S'), c.when.time().replace(microsecond=0),
+                c.latitude, c.longitude)
+
+    def _finish(self, clock_in, status, existing_time=None):
+        result = _result(status, clock_in.employee, clock_in.when)
+        if status == 'duplicate':
+            result['time'] = str(existing_time)
+            self.stats['duplicates'] += 1
+        else:
+            self.stats['recorded'] += 1
+        if clock_in.key is not None:
+            with self._lock:
+                self._keys[clock_in.key] = result
+                while len(self._keys) > MAX_REMEMBERED_KEYS:
+                    self._keys.popitem(last=False)
+        clock_in.future.set_result(result)
+
+
+writer = AttendanceWriter()
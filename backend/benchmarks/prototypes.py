@@ -0,0 +1,107 @@
+"""Compare a model trained on the whole dataset with one trained on compacted prototypes.
+
+Every 10th image of each person is held out as a query; the rest is used
+to train one model on all images and one on at most --prototypes diverse
+faces per person (compaction.compact). Reports training time, model file
+size, predict latency and hold-out accuracy of both. The live model is not
+touched. Run from the backend directory:
+
+    python -m benchmarks.prototypes [--prototypes 20] [--backend lbph]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import compaction
+import recognizers
+import training
+from model_registry import registry
+
+
+def split_holdout(faces, labels, names, every=10):
+    train, queries = ([], [], []), ([], [])
+    seen = {}
+    for face, label, name in zip(faces, labels, names):
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] % every == 0:
+            queries[0].append(face)
+            queries[1].append(label)
+        else:
+            for column, value in zip(train, (face, label, name)):
+                column.append(value)
+    return train, queries
+
+
+def measure(backend, faces, labels, queries, workdir):
+    clf = recognizers.create(backend)
+    start = time.perf_counter()
+    clf.train(faces, labels)
+    train_s = time.perf_counter() - start
+
+    path = os.path.join(workdir, f'model-{len(faces)}' + clf.extension)
+    clf.write(path)
+
+    timings, correct = [], 0
+    for face, label in zip(*queries):
+        start = time.perf_counter()
+        person_id, _ = clf.predict(face)
+        timings.append(time.perf_counter() - start)
+        correct += int(person_id == label)
+
+    timings.sort()
+    return {
+        'images': len(faces),
+        'train_s': round(train_s, 2),
+        'model_kb': round(os.path.getsize(path) / 1024, 1),
+        'predict_mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'predict_p95_ms': round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+        'accuracy': round(correct / len(timings), 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default=training.DATASET_DIR)
+    parser.add_argument('--prototypes', type=int, default=20, help='faces kept per person')
+    parser.add_argument('--duplicate-distance', type=int, default=compaction.DUPLICATE_DISTANCE)
+    parser.add_argument('--backend', default=registry.backend, choices=sorted(recognizers.BACKENDS))
+    parser.add_argument('--json', action='store_true', help='print JSON only')
+    args = parser.parse_args(argv)
+
+    entries = training.list_dataset(args.dataset)
+    faces, labels, names = training.load_faces(entries, args.dataset)
+    (faces, labels, names), queries = split_holdout(faces, labels, names)
+    if not queries[0]:
+        parser.error('dataset too small: need at least 10 images for some person')
+
+    kept_faces, kept_labels, _, _ = compaction.compact(
+        faces, labels, names, args.prototypes, args.duplicate_distance
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {
+            'backend': args.backend,
+            'prototypes': args.prototypes,
+            'queries': len(queries[0]),
+            'before': measure(args.backend, faces, labels, queries, workdir),
+            'after': measure(args.backend, kept_faces, kept_labels, queries, workdir)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return results
+
+    print(f"backend {results['backend']}, prototypes/person {args.prototypes}, "
+          f"{results['queries']} held-out queries")
+    print(f"{'':<7} {'images':>7} {'train s':>8} {'model KB':>10} {'mean ms':>8} {'p95 ms':>8} {'accuracy':>9}")
+    for key in ('before', 'after'):
+        r = results[key]
+        print(f"{key:<7} {r['images']:>7} {r['train_s']:>8} {r['model_kb']:>10} "
+              f"{r['predict_mean_ms']:>8} {r['predict_p95_ms']:>8} {r['accuracy']:>9}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Check that a sharded model recognizes as well as an unsharded one.
+
+Every 10th image of each person is held out as a query; the rest trains
+one unsharded model and one sharded model (sharding.write_shards, the code
+path full training uses). The hold-out accuracy of both is compared per
+backend, and the run fails (exit status 1) when the sharded model is more
+than --tolerance worse. By default the data is a synthetic dataset
+(benchmarks.synthetic) whose people are spread over five departments; pass
+--dataset to use real images. The live model is not touched. Run from the
+backend directory:
+
+    python -m benchmarks.shards [--shard-by skill] [--backends lbph,embedding]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+import recognizers
+import sharding
+import training
+from model_registry import ModelRegistry, registry
+from benchmarks import synthetic
+from benchmarks.prototypes import split_holdout
+from benchmarks.suite import use_synthetic_directory
+
+
+def accuracy(clf, queries):
+    correct = 0
+    for face, label in zip(*queries):
+        correct += int(clf.predict(face)[0] == label)
+    return round(correct / len(queries[0]), 3)
+
+
+def compare(backend, faces, labels, queries, shard_by, shard_count, workdir):
+    clf = recognizers.create(backend)
+    clf.train(faces, labels)
+
+    sharded = ModelRegistry(
+        classifier_path=os.path.join(workdir, backend, sharding.SHARD_MANIFEST),
+        backend=backend, shard_by=shard_by, shard_count=shard_count
+    )
+    keys = sharding.write_shards(sharded, faces, labels, replace=True)
+    return {
+        'shards': len(keys),
+        'unsharded': accuracy(clf, queries),
+        'sharded': accuracy(sharded.get_recognizer(), queries)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', help='dataset directory (default: a synthetic one)')
+    parser.add_argument('--people', type=int, default=20, help='synthetic people')
+    parser.add_argument('--images', type=int, default=30, help='synthetic images per person')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-by', choices=('hash', 'skill'), default='skill')
+    parser.add_argument('--shards', type=int, default=4, help='shard count for --shard-by hash')
+    parser.add_argument('--backends', default=','.join(sorted(recognizers.BACKENDS)))
+    parser.add_argument('--tolerance', type=float, default=0.05, help='accuracy the sharded model may lose')
+    parser.add_argument('--json', action='store_true', help='print JSON only')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        dataset = args.dataset
+        if dataset is None:
+            dataset = os.path.join(workdir, 'dataset')
+            ids = synthetic.generate(dataset, args.people, args.images, args.seed, registry.get_cascade())
+            use_synthetic_directory(ids)
+
+        entries = training.list_dataset(dataset)
+        faces, labels, names = training.load_faces(entries, dataset)
+        (faces, labels, _), queries = split_holdout(faces, labels, names)
+        if not queries[0]:
+            parser.error('dataset too small: need at least 10 images for some person')
+
+        results = {
+            'shard_by': args.shard_by,
+            'queries': len(queries[0]),
+            'backends': {
+                backend: compare(backend, faces, labels, queries, args.shard_by, args.shards, workdir)
+                for backend in args.backends.split(',')
+            }
+        }
+
+    failed = [b for b, r in results['backends'].items() if r['sharded'] < r['unsharded'] - args.tolerance]
+    results['ok'] = not failed
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0 if results['ok'] else 1
+
+    print(f"shard by {args.shard_by}, {results['queries']} held-out queries")
+    print(f"{'backend':<10} {'shards':>6} {'unsharded':>10} {'sharded':>8}")
+    for backend, r in results['backends'].items():
+        print(f"{backend:<10} {r['shards']:>6} {r['unsharded']:>10} {r['sharded']:>8}"
+              + ("  FAIL" if backend in failed else ""))
+    return 0 if results['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
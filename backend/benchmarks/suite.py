@@ -0,0 +1,530 @@
+"""Offline benchmark suite: training, recognition, live stream and dashboard queries.
+
+Builds a synthetic dataset (benchmarks.synthetic) of --people x --images
+faces in a scratch directory and measures, in-process through the Flask
+test client:
+
+  train      POST /api/face/train/<nbr>?full=1: wall time, peak RSS, model size
+  recognize  POST /api/face/recognize latency percentiles, accuracy, and
+             throughput with 1..N concurrent clients
+  stream     recognition stream FPS from a file-backed camera (a looping
+             video of synthetic faces) with per-stage timings
+  dashboard  dashboard / history queries against a seeded SQLite database
+             (default) or a scratch MySQL database (--db mysql)
+
+The live model, dataset and database are not touched; employees are
+served from a synthetic directory. Results are written as JSON so runs can
+be compared. Run from the backend directory:
+
+    python -m benchmarks.suite [--people 20 --images 30] [--only train,recognize]
+        [--output results.json] [--compare previous.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks import synthetic
+
+SECTIONS = ('train', 'recognize', 'stream', 'dashboard')
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources')
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    if not timings:
+        return {}
+    pick = lambda q: timings[min(len(timings) - 1, int(len(timings) * q))]
+    return {
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p95_ms': round(pick(0.95) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3)
+    }
+
+
+def rss_mb():
+    """Current resident set size, or None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakRSS:
+    """Samples RSS in a background thread while the block runs"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.before = self.peak = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            current = rss_mb()
+            if current is not None:
+                self.peak = max(self.peak or 0, current)
+
+    def __enter__(self):
+        self.before = self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def use_synthetic_directory(ids):
+    """Serve the synthetic people from the employee directory instead of prs_mstr"""
+    from employee_directory import Employee, directory
+    employees = {str(i): Employee(str(i), f"Synthetic {i}", f"Dept {i % 5}", 'Y', None) for i in ids}
+
+    def fetch(where="", params=()):
+        if params:
+            return [employees[str(params[0])]] if str(params[0]) in employees else []
+        return list(employees.values())
+
+    directory._fetch = fetch
+    directory.invalidate()
+
+
+# ==================== TRAIN ====================
+
+def bench_train(client, ids, images):
+    from model_registry import registry
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        response = client.post(f'/api/face/train/{ids[0]}?full=1&wait=3600')
+        elapsed = time.perf_counter() - start
+    body = response.get_json()
+    if response.status_code != 200:
+        raise RuntimeError(f"training failed: {body.get('message')}")
+
+    path = registry.classifier_path
+    if registry.sharded:
+        folder = os.path.dirname(path)
+        size = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+    else:
+        size = os.path.getsize(path)
+    return {
+        'backend': registry.backend,
+        'persons': len(ids),
+        'images': len(ids) * images,
+        'wall_s': round(elapsed, 3),
+        'rss_before_mb': round(rss.before, 1) if rss.before else None,
+        'rss_peak_mb': round(rss.peak, 1) if rss.peak else None,
+        'model_kb': round(size / 1024, 1)
+    }
+
+
+# ==================== RECOGNIZE ====================
+
+def _recognize(client, jpeg):
+    start = time.perf_counter()
+    body = client.post('/api/face/recognize', data=jpeg, content_type='image/jpeg').get_json()
+    return time.perf_counter() - start, body
+
+
+def bench_recognize(app, ids, count, clients, seed):
+    queries = synthetic.queries(ids, count, seed)
+    client = app.test_client()
+    _recognize(client, queries[0][1])  # load model and cascade
+
+    timings, detected, correct = [], 0, 0
+    for person_id, jpeg in queries:
+        elapsed, body = _recognize(client, jpeg)
+        timings.append(elapsed)
+        if body.get('success'):
+            detected += 1
+            employee = body.get('employee') or {}
+            correct += int(body.get('recognized') and str(employee.get('id')) == str(person_id))
+
+    result = {
+        'queries': len(queries),
+        'detected': detected,
+        'accuracy': round(correct / len(queries), 3),
+        'latency': percentiles(timings),
+        'concurrency': {}
+    }
+
+    local = threading.local()
+
+    def worker(jpeg):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return _recognize(local.client, jpeg)[0]
+
+    for n in clients:
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            start = time.perf_counter()
+            timings = list(pool.map(worker, [jpeg for _, jpeg in queries]))
+            elapsed = time.perf_counter() - start
+        result['concurrency'][str(n)] = dict(
+            percentiles(timings), requests=len(timings), throughput_rps=round(len(timings) / elapsed, 1)
+        )
+    return result
+
+
+# ==================== STREAM ====================
+
+def write_video(path, ids, frames, seed, fps=15):
+    """Looping MJPEG video where one synthetic person walks across the frame"""
+    rng = np.random.default_rng([seed, 2])
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (640, 480))
+    face = synthetic.identity(seed, ids[0])
+    for i in range(frames):
+        img = np.full((480, 640), 70, np.uint8)
+        x = 40 + (i * 8) % 400
+        img[140:340, x:x + 200] = synthetic.render(face, rng)
+        writer.write(cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    writer.release()
+
+
+def bench_stream(ids, seconds, fps, seed, workdir):
+    import camera
+    from employee_directory import directory
+    from live_recognition import LiveRecognizer
+    from model_registry import registry
+
+    path = os.path.join(workdir, 'stream.avi')
+    write_video(path, ids, 90, seed)
+    confirmed = []
+    # No idle lingering: both threads must be gone before workdir is removed
+    source = camera.Camera(path, fps=fps, idle_timeout=0)
+    processor = camera.FrameProcessor(
+        source,
+        LiveRecognizer(registry.get_recognizer, registry.get_cascade, directory.get,
+                       on_confirm=confirmed.append),
+        fps=fps, idle_timeout=0, name='bench'
+    )
+    frames = processor.subscribe()
+    try:
+        next(frames)  # warm up: camera open, first detection
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            next(frames)
+            count += 1
+        elapsed = time.perf_counter() - start
+        stats = processor.stats()
+    finally:
+        frames.close()
+        # The processor releases the camera on its way out, so join it first
+        processor.join()
+        source.join()
+
+    stages = dict(stats['stages'], **stats.get('pipeline', {}).get('stages', {}))
+    return {
+        'target_fps': fps,
+        'fps': round(count / elapsed, 1),
+        'frames': count,
+        'confirmations': len(confirmed),
+        'stages_avg_ms': {stage: timing['avg_ms'] for stage, timing in stages.items()}
+    }
+
+
+# ==================== DASHBOARD ====================
+
+class QmarkCursor:
+    """Runs the app's %s-style SQL on sqlite3"""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace('%s', '?'), self._params(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace('%s', '?'), [self._params(p) for p in rows])
+
+    @staticmethod
+    def _params(params):
+        return [p.isoformat() if isinstance(p, date) else p for p in params]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._row(row) if row else None
+
+    @staticmethod
+    def _row(row):
+        return tuple(date.fromisoformat(v) if isinstance(v, str) and len(v) == 10 and v[4] == '-' else v
+                     for v in row)
+
+
+SCHEMA = {
+    'sqlite': [
+        "CREATE TABLE absensi (id INTEGER PRIMARY KEY, person TEXT NOT NULL, nama TEXT, skill TEXT,"
+        " tanggal TEXT NOT NULL, waktu TEXT, jam TEXT, latitude TEXT, longitude TEXT)",
+        "CREATE UNIQUE INDEX uq_absensi_person_tanggal ON absensi (person, tanggal)",
+        "CREATE INDEX idx_absensi_tanggal_jam ON absensi (tanggal, jam)",
+        "CREATE TABLE absensi_daily (tanggal TEXT PRIMARY KEY, present INT, late INT, headcount INT)",
+    ],
+    'mysql': [
+        "DROP TABLE IF EXISTS absensi",
+        "DROP TABLE IF EXISTS absensi_daily",
+        "CREATE TABLE absensi (id int NOT NULL AUTO_INCREMENT PRIMARY KEY, person varchar(100) NOT NULL,"
+        " nama varchar(100), skill varchar(100), tanggal date NOT NULL, waktu varchar(100), jam time,"
+        " latitude varchar(100), longitude varchar(100),"
+        " UNIQUE KEY uq_absensi_person_tanggal (person, tanggal),"
+        " KEY idx_absensi_tanggal_jam (tanggal, jam)) ENGINE=InnoDB",
+        "CREATE TABLE absensi_daily (tanggal date NOT NULL PRIMARY KEY, present int, late int,"
+        " headcount int) ENGINE=InnoDB",
+    ],
+}
+
+# Dashboard queries as the API runs them (rollup) and as it ran them
+# before absensi_daily existed (raw), with %s for the date of "today"
+QUERIES = {
+    'mysql': {
+        'stats_rollup': ("SELECT present, late FROM absensi_daily WHERE tanggal = %s", 1),
+        'stats_raw': ("SELECT COUNT(DISTINCT person), SUM(TIME(waktu) > '09:00:00') FROM absensi"
+                      " WHERE tanggal = %s", 1),
+        'weekly_rollup': ("SELECT DAYNAME(tanggal), present, late FROM absensi_daily"
+                          " WHERE tanggal >= DATE_SUB(%s, INTERVAL 7 DAY) AND present > 0 ORDER BY tanggal", 1),
+        'weekly_raw': ("SELECT DAYNAME(tanggal), COUNT(*), SUM(CASE WHEN TIME(waktu) > '09:00:00' THEN 1 ELSE 0 END)"
+                       " FROM absensi WHERE tanggal >= DATE_SUB(%s, INTERVAL 7 DAY)"
+                       " GROUP BY tanggal, DAYNAME(tanggal) ORDER BY tanggal", 1),
+        'monthly_rollup': ("SELECT DATE_FORMAT(MIN(tanggal), '%%b'), SUM(present) * 100.0 / SUM(headcount)"
+                           " FROM absensi_daily WHERE tanggal >= DATE_SUB(%s, INTERVAL 6 MONTH) AND present > 0"
+                           " GROUP BY YEAR(tanggal), MONTH(tanggal) ORDER BY YEAR(tanggal), MONTH(tanggal)", 1),
+        'monthly_raw': ("SELECT DATE_FORMAT(MIN(tanggal), '%%b'), COUNT(*) * 100.0 / %s FROM absensi"
+                        " WHERE tanggal >= DATE_SUB(%s, INTERVAL 6 MONTH)"
+                        " GROUP BY YEAR(tanggal), MONTH(tanggal)", 2),
+        'today': ("SELECT id, person, nama, skill, tanggal, waktu, latitude, longitude, jam < '09:00:00'"
+                  " FROM absensi WHERE tanggal = %s ORDER BY jam DESC", 1),
+    },
+    'sqlite': {
+        'stats_rollup': ("SELECT present, late FROM absensi_daily WHERE tanggal = %s", 1),
+        'stats_raw': ("SELECT COUNT(DISTINCT person), SUM(time(waktu) > '09:00:00') FROM absensi"
+                      " WHERE tanggal = %s", 1),
+        'weekly_rollup': ("SELECT strftime('%w', tanggal), present, late FROM absensi_daily"
+                          " WHERE tanggal >= date(%s, '-7 day') AND present > 0 ORDER BY tanggal", 1),
+        'weekly_raw': ("SELECT strftime('%w', tanggal), COUNT(*), SUM(CASE WHEN time(waktu) > '09:00:00' THEN 1 ELSE 0 END)"
+                       " FROM absensi WHERE tanggal >= date(%s, '-7 day') GROUP BY tanggal ORDER BY tanggal", 1),
+        'monthly_rollup': ("SELECT strftime('%m', MIN(tanggal)), SUM(present) * 100.0 / SUM(headcount)"
+                           " FROM absensi_daily WHERE tanggal >= date(%s, '-6 month') AND present > 0"
+                           " GROUP BY strftime('%Y-%m', tanggal) ORDER BY 1", 1),
+        'monthly_raw': ("SELECT strftime('%m', MIN(tanggal)), COUNT(*) * 100.0 / %s FROM absensi"
+                        " WHERE tanggal >= date(%s, '-6 month') GROUP BY strftime('%Y-%m', tanggal)", 2),
+        'today': ("SELECT id, person, nama, skill, tanggal, waktu, latitude, longitude, jam < '09:00:00'"
+                  " FROM absensi WHERE tanggal = %s ORDER BY jam DESC", 1),
+    },
+}
+
+
+def seed_attendance(cursor, employees, days, today, seed):
+    """~90% of employees check in every day, around 08:30; returns rows written"""
+    import attendance_rollup
+    rng = np.random.default_rng([seed, 3])
+    rows, daily = [], []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        present = late = 0
+        for person in range(1, employees + 1):
+            if rng.random() > 0.9:
+                continue
+            seconds = int(np.clip(rng.normal(8.5 * 3600, 1800), 6 * 3600, 12 * 3600))
+            at = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+            rows.append((str(person), f"Employee {person}", 'Staff', day, at, at))
+            present += 1
+            late += int(attendance_rollup.is_late(timedelta(seconds=seconds)))
+        daily.append((day, present, late, employees))
+    for start in range(0, len(rows), 5000):
+        cursor.executemany(
+            "INSERT INTO absensi (person, nama, skill, tanggal, waktu, jam) VALUES (%s, %s, %s, %s, %s, %s)",
+            rows[start:start + 5000]
+        )
+    cursor.executemany("INSERT INTO absensi_daily (tanggal, present, late, headcount) VALUES (%s, %s, %s, %s)",
+                       daily)
+    return len(rows)
+
+
+def _time_query(cursor, query, params, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def bench_dashboard(args, workdir):
+    import attendance_history
+
+    if args.db == 'mysql':
+        import mysql.connector
+        import db
+        if args.mysql_database == db.DB_CONFIG['database']:
+            raise SystemExit(f"Refusing to seed the application database {args.mysql_database}")
+        config = dict(db.DB_CONFIG)
+        config.pop('database')
+        conn = mysql.connector.connect(**config)
+        conn.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{args.mysql_database}`")
+        conn.database = args.mysql_database
+        cursor = conn.cursor()
+    else:
+        conn = sqlite3.connect(os.path.join(workdir, 'dashboard.sqlite3'))
+        cursor = QmarkCursor(conn)
+
+    try:
+        for statement in SCHEMA[args.db]:
+            cursor.execute(statement)
+        today = date.today()
+        start = time.perf_counter()
+        rows = seed_attendance(cursor, args.employees, args.days, today, args.seed)
+        conn.commit()
+        seed_s = time.perf_counter() - start
+
+        result = {'db': args.db, 'employees': args.employees, 'days': args.days, 'rows': rows,
+                  'seed_s': round(seed_s, 2), 'queries': {}}
+        for name, (query, arity) in QUERIES[args.db].items():
+            params = (args.employees, today) if arity == 2 else (today,)
+            result['queries'][name] = _time_query(cursor, query, params, args.query_runs)
+
+        # Keyset pagination: first page and a page deep into the history
+        filters = {'employeeId': None, 'from': None, 'to': None}
+        timings, deep = [], []
+        for _ in range(args.query_runs):
+            started = time.perf_counter()
+            page_rows, next_cursor = attendance_history.page(cursor, filters, 100)
+            timings.append(time.perf_counter() - started)
+        after = attendance_history.decode_cursor(next_cursor)
+        for _ in range(args.days // 2):
+            page_rows, next_cursor = attendance_history.page(cursor, filters, 100, after)
+            if not next_cursor:
+                break
+            after = attendance_history.decode_cursor(next_cursor)
+        for _ in range(args.query_runs):
+            started = time.perf_counter()
+            attendance_history.page(cursor, filters, 100, after)
+            deep.append(time.perf_counter() - started)
+        result['queries']['history_first_page'] = percentiles(timings)
+        result['queries']['history_deep_page'] = percentiles(deep)
+        return result
+    finally:
+        if args.db == 'mysql':
+            for table in ('absensi', 'absensi_daily'):
+                conn.cursor().execute(f"DROP TABLE IF EXISTS {table}")
+        conn.close()
+
+
+# ==================== RUNNER ====================
+
+def compare(previous, current, prefix=''):
+    """Print numeric values that changed between two result files"""
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            compare(old or {}, value, name + '.')
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old != value:
+            change = f" ({(value - old) / old * 100:+.1f}%)" if old else ''
+            print(f"{name:<60} {old:>12} -> {value:<12}{change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--people', type=int, default=20)
+    parser.add_argument('--images', type=int, default=30, help='images per person')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', default=','.join(SECTIONS), help='comma-separated sections to run')
+    parser.add_argument('--queries', type=int, default=100, help='recognize requests per run')
+    parser.add_argument('--clients', default='1,4,8', help='concurrent recognize clients to try')
+    parser.add_argument('--stream-seconds', type=float, default=5)
+    parser.add_argument('--stream-fps', type=int, default=30, help='camera and processor rate')
+    parser.add_argument('--db', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--mysql-database', default='flask_db_bench',
+                        help='scratch database for --db mysql (created, tables dropped afterwards)')
+    parser.add_argument('--employees', type=int, default=200, help='employees in the dashboard data')
+    parser.add_argument('--days', type=int, default=365, help='days of dashboard history')
+    parser.add_argument('--query-runs', type=int, default=20)
+    parser.add_argument('--workdir', help='scratch directory (default: a temporary one)')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--compare', help='previous results JSON to diff against')
+    args = parser.parse_args(argv)
+
+    sections = [s.strip() for s in args.only.split(',') if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+    if 'recognize' in sections or 'stream' in sections:
+        if 'train' not in sections:
+            sections.insert(0, 'train')  # they need a model trained on the synthetic people
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='faceattend-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    # The app resolves dataset/, models and resources/ relative to the cwd
+    if not os.path.exists(os.path.join(workdir, 'resources')):
+        shutil.copytree(RESOURCES_DIR, os.path.join(workdir, 'resources'))
+    os.chdir(workdir)
+    try:
+        import api
+        from model_registry import registry
+
+        results = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'opencv': cv2.__version__,
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'backend': registry.backend,
+                'args': vars(args)
+            }
+        }
+        ids = synthetic.person_ids(args.people)
+        if 'train' in sections:
+            if not os.path.isdir('dataset'):
+                start = time.perf_counter()
+                synthetic.generate('dataset', args.people, args.images, args.seed, registry.get_cascade())
+                results['dataset'] = {'people': args.people, 'images': args.people * args.images,
+                                      'generate_s': round(time.perf_counter() - start, 2)}
+            use_synthetic_directory(ids)
+            results['train'] = bench_train(api.app.test_client(), ids, args.images)
+        if 'recognize' in sections:
+            clients = [int(n) for n in args.clients.split(',') if n.strip()]
+            results['recognize'] = bench_recognize(api.app, ids, args.queries, clients, args.seed)
+        if 'stream' in sections:
+            results['stream'] = bench_stream(ids, args.stream_seconds, args.stream_fps, args.seed, workdir)
+        if 'dashboard' in sections:
+            results['dashboard'] = bench_dashboard(args, workdir)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Generate a synthetic face dataset for the benchmarks.
+
+Every person gets a random face geometry (head shape, eye spacing, brows,
+nose, mouth, skin and background tone) drawn with OpenCV; every image of
+that person is the same face with a random shift, scale, rotation,
+brightness and noise. The drawings are found by the Haar cascade, so they
+can also be used as recognize queries and stream frames. Identities only
+depend on the seed and the person id, so runs are reproducible. Run from
+the backend directory:
+
+    python -m benchmarks.synthetic --people 50 --images 40 --out /tmp/bench/dataset
+"""
+import os
+import argparse
+
+import cv2
+import numpy as np
+
+import dataset_capture
+from model_registry import registry
+
+# Synthetic employees are numbered from here, away from real prs_nbr values
+FIRST_PERSON = 9001
+FACE_SIZE = 200
+
+
+def identity(seed, person_id):
+    """Face geometry of one synthetic person"""
+    rng = np.random.default_rng([seed, person_id])
+    return {
+        'background': int(rng.integers(20, 90)),
+        'head_w': int(rng.integers(60, 76)),
+        'head_h': int(rng.integers(78, 94)),
+        'skin': int(rng.integers(140, 215)),
+        'eye_dx': int(rng.integers(22, 34)),
+        'eye_y': int(rng.integers(76, 92)),
+        'eye_w': int(rng.integers(8, 15)),
+        'eye_h': int(rng.integers(4, 9)),
+        'brow_tilt': int(rng.integers(-5, 6)),
+        'brow_gap': int(rng.integers(14, 22)),
+        'nose_len': int(rng.integers(28, 44)),
+        'mouth_y': int(rng.integers(138, 154)),
+        'mouth_w': int(rng.integers(16, 32)),
+        'mouth_curve': int(rng.integers(4, 14)),
+    }
+
+
+def render(face, rng=None):
+    """200x200 grayscale drawing of `face`, jittered when rng is given"""
+    img = np.full((FACE_SIZE, FACE_SIZE), face['background'], np.uint8)
+    cv2.ellipse(img, (100, 105), (face['head_w'], face['head_h']), 0, 0, 360, face['skin'], -1)
+    eye_y = face['eye_y']
+    for side in (-1, 1):
+        cx = 100 + side * face['eye_dx']
+        cv2.ellipse(img, (cx, eye_y), (face['eye_w'], face['eye_h']), 0, 0, 360, 40, -1)
+        brow_y = eye_y - face['brow_gap']
+        cv2.line(img, (cx - 18, brow_y), (cx + 18, brow_y - side * face['brow_tilt']), 30, 5)
+    cv2.line(img, (100, eye_y + 5), (94, eye_y + face['nose_len']), face['skin'] - 50, 4)
+    cv2.ellipse(img, (100, face['mouth_y']), (face['mouth_w'], face['mouth_curve']), 0, 0, 180, 50, 4)
+
+    if rng is not None:
+        angle = rng.uniform(-6, 6)
+        scale = rng.uniform(0.94, 1.06)
+        matrix = cv2.getRotationMatrix2D((100, 100), angle, scale)
+        matrix[:, 2] += rng.uniform(-5, 5, 2)
+        img = cv2.warpAffine(img, matrix, (FACE_SIZE, FACE_SIZE), borderMode=cv2.BORDER_REPLICATE)
+        img = cv2.convertScaleAbs(img, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-20, 20))
+        noise = rng.normal(0, 6, img.shape)
+        img = np.clip(img + noise, 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def frame(face_img, rng, width=640, height=480):
+    """BGR camera-like frame with the face placed somewhere in it"""
+    size = int(rng.integers(150, 230))
+    img = np.full((height, width), int(rng.integers(40, 120)), np.uint8)
+    x = int(rng.integers(0, width - size))
+    y = int(rng.integers(0, height - size))
+    img[y:y + size, x:x + size] = cv2.resize(face_img, (size, size))
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+
+def person_ids(people):
+    return list(range(FIRST_PERSON, FIRST_PERSON + people))
+
+
+def generate(out_dir, people, images, seed=0, cascade=None):
+    """Write {nbr}.{img_id}.jpg files; returns the person ids.
+
+    With a cascade, each face is placed in a frame and cropped the way
+    enrollment does (dataset_capture.crop_face), so dataset crops match
+    what recognition sees; frames without a detection fall back to the
+    plain drawing.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    img_id = 0
+    ids = person_ids(people)
+    for person_id in ids:
+        face = identity(seed, person_id)
+        for _ in range(images):
+            img_id += 1
+            img = render(face, rng)
+            if cascade is not None:
+                crop = dataset_capture.crop_face(cascade, cv2.cvtColor(frame(img, rng), cv2.COLOR_BGR2GRAY))
+                img = crop if crop is not None else img
+            cv2.imwrite(os.path.join(out_dir, f"{person_id}.{img_id}.jpg"), img)
+    return ids
+
+
+def queries(ids, count, seed=0):
+    """[(person_id, JPEG bytes)] of fresh images (not in the dataset) as camera frames"""
+    rng = np.random.default_rng([seed, 1])
+    result = []
+    for i in range(count):
+        person_id = ids[i % len(ids)]
+        img = frame(render(identity(seed, person_id), rng), rng)
+        result.append((person_id, cv2.imencode('.jpg', img)[1].tobytes()))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--people', type=int, default=20)
+    parser.add_argument('--images', type=int, default=30, help='images per person')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='dataset_synthetic')
+    args = parser.parse_args(argv)
+
+    ids = generate(args.out, args.people, args.images, args.seed, registry.get_cascade())
+    print(f"Wrote {len(ids) * args.images} images of {len(ids)} people to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compare the base64 JSON and raw/multipart upload paths of /api/face/recognize.
+
+Only the request parsing + image decoding is measured (read_request_images),
+so the numbers show what the transport format costs independent of face
+detection and prediction. Run from the backend directory:
+
+    python -m benchmarks.upload_paths [--image path.jpg] [--runs 200]
+"""
+import io
+import gc
+import json
+import time
+import base64
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import api
+
+
+def synthetic_jpeg(width=640, height=480, quality=90):
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+    return cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def request_kwargs(kind, jpeg):
+    if kind == 'base64-json':
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode()
+        body = json.dumps({'image': data_url}).encode()
+        return {'data': body, 'content_type': 'application/json'}, len(body)
+    if kind == 'raw-jpeg':
+        return {'data': jpeg, 'content_type': 'image/jpeg'}, len(jpeg)
+    if kind == 'multipart':
+        # Size of the multipart body is roughly the JPEG plus a small header
+        return None, len(jpeg) + 200
+    raise ValueError(kind)
+
+
+def make_context(kind, jpeg):
+    kwargs, _ = request_kwargs(kind, jpeg)
+    if kind == 'multipart':
+        kwargs = {'data': {'image': (io.BytesIO(jpeg), 'face.jpg', 'image/jpeg')},
+                  'content_type': 'multipart/form-data'}
+    return api.app.test_request_context('/api/face/recognize', method='POST', **kwargs)
+
+
+def measure(kind, jpeg, runs):
+    timings = []
+    for _ in range(runs):
+        with make_context(kind, jpeg):
+            start = time.perf_counter()
+            images = api.read_request_images('image')
+            timings.append(time.perf_counter() - start)
+            assert images and images[0] is not None
+
+    # Peak Python-visible allocation for one request, measured separately
+    # so tracing does not distort the timings
+    gc.collect()
+    with make_context(kind, jpeg):
+        tracemalloc.start()
+        api.read_request_images('image')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'body_bytes': request_kwargs(kind, jpeg)[1],
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+        'peak_alloc_kb': round(peak / 1024, 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', help='JPEG to post (default: synthetic 640x480)')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='print JSON only')
+    args = parser.parse_args(argv)
+
+    jpeg = open(args.image, 'rb').read() if args.image else synthetic_jpeg()
+    results = {kind: measure(kind, jpeg, args.runs)
+               for kind in ('base64-json', 'raw-jpeg', 'multipart')}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return results
+
+    print(f"JPEG size: {len(jpeg)} bytes, {args.runs} runs")
+    print(f"{'path':<12} {'body':>9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9}")
+    for kind, r in results.items():
+        print(f"{kind:<12} {r['body_bytes']:>9} {r['mean_ms']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['peak_alloc_kb']:>9}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Camera used by the video endpoints: a device index ("0"), a video/image
+# file path, or "synthetic" for generated test frames
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', '0')
+# Rate at which annotated frames are produced, whatever the client count
+STREAM_FPS = float(os.environ.get('STREAM_FPS', 15))
+# Seconds a thread keeps running after its last consumer left
+IDLE_TIMEOUT = float(os.environ.get('CAMERA_IDLE_TIMEOUT', 5))
+# Consecutive failed reads before a camera is considered gone
+MAX_READ_FAILURES = 30
+# Weight of the newest sample in the moving-average stage timings
+TIMING_ALPHA = 0.1
+
+
+class StageTimer:
+    """Moving-average wall time per pipeline stage"""
+
+    def __init__(self, alpha=TIMING_ALPHA):
+        self.alpha = alpha
+        self.ms = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        ms = seconds * 1000
+        prev = self.ms.get(stage)
+        self.ms[stage] = ms if prev is None else prev + self.alpha * (ms - prev)
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def snapshot(self):
+        return {stage: {'avg_ms': round(ms, 2), 'count': self.counts[stage]}
+                for stage, ms in self.ms.items()}
+
+
+class FrameBuffer:
+    """Small ring buffer of the most recent frames with blocking reads"""
+
+    def __init__(self, size=4):
+        self._frames = deque(maxlen=size)
+        self._cond = threading.Condition()
+        self.seq = 0
+        self.error = None
+
+    def publish(self, frame):
+        with self._cond:
+            self.seq += 1
+            self._frames.append((self.seq, frame))
+            self.error = None
+            self._cond.notify_all()
+
+    def fail(self, error):
+        with self._cond:
+            self.error = error
+            self._cond.notify_all()
+
+    def reset(self):
+        """Drop the frames and error of a previous run.
+
+        seq keeps counting, so a reader still holding an old seq waits for
+        the next frame instead of missing it.
+        """
+        with self._cond:
+            self._frames.clear()
+            self.error = None
+
+    def latest(self):
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def _newer(self, after_seq):
+        return bool(self._frames) and self._frames[-1][0] > after_seq
+
+    def wait_for(self, after_seq, timeout=None):
+        """Return the newest (seq, frame) with seq > after_seq, or None on timeout/error"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._newer(after_seq) and self.error is None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self.error is not None:
+                return None
+            return self._frames[-1]
+
+
+class SyntheticCapture:
+    """cv2.VideoCapture stand-in that generates frames, for tests.
+
+    Cycles through `frames` if given, otherwise draws a moving gradient
+    with a frame counter.
+    """
+
+    def __init__(self, frames=None, width=640, height=480):
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.count = 0
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        self.count += 1
+        if self.frames:
+            return True, self.frames[(self.count - 1) % len(self.frames)].copy()
+        ramp = np.linspace(0, 255, self.width, dtype=np.uint8)
+        img = np.dstack([np.tile(np.roll(ramp, self.count * 4), (self.height, 1))] * 3)
+        cv2.putText(img, str(self.count), (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        return True, img
+
+    def release(self):
+        pass
+
+
+class FileCapture:
+    """Loops over a video or still image file, for tests and benchmarks"""
+
+    def __init__(self, path):
+        self.path = path
+        self.image = cv2.imread(path)
+        self.cap = None if self.image is not None else cv2.VideoCapture(path)
+
+    def isOpened(self):
+        return self.image is not None or self.cap.isOpened()
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        if self.image is not None:
+            return True, self.image.copy()
+        ret, img = self.cap.read()
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, img = self.cap.read()
+        return ret, img
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+def open_capture(source):
+    """Open a frame source: device index, file path, "synthetic" or a factory"""
+    if callable(source):
+        return source()
+    if isinstance(source, int) or str(source).isdigit():
+        cap = cv2.VideoCapture(int(source))
+        cap.set(3, 400)
+        cap.set(4, 400)
+        return cap
+    if source == 'synthetic':
+        return SyntheticCapture()
+    return FileCapture(source)
+
+
+class _Worker:
+    """Reference-counted background thread that publishes to `output`.
+
+    The thread starts with the first user and lingers IDLE_TIMEOUT seconds
+    after the last one leaves, so quick reconnects reuse it.
+    """
+
+    name = 'worker'
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.output = FrameBuffer()
+        self._lock = threading.Lock()
+        # Serialises restarts, which wait for the previous thread to exit
+        self._start_lock = threading.Lock()
+        self._users = 0
+        self._idle_since = None
+        self._thread = None
+        # Last thread started; unlike _thread it is kept until it has exited
+        self._started = None
+
+    def acquire(self):
+        with self._start_lock:
+            with self._lock:
+                self._users += 1
+                self._idle_since = None
+                if self._thread is not None:
+                    return
+            # A stopping run may still hold the device; let it release it
+            # first (outside _lock, which its thread takes on the way out)
+            self.join()
+            with self._lock:
+                if self._thread is None:
+                    # Forget the frames and error of the previous run
+                    self.output.reset()
+                    self._thread = self._started = threading.Thread(target=self._main, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0:
+                self._idle_since = time.monotonic()
+
+    def join(self, timeout=None):
+        """Wait for the thread to exit after the last user left (and idle_timeout passed)"""
+        thread = self._started
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    @property
+    def users(self):
+        return self._users
+
+    def _should_stop(self):
+        with self._lock:
+            if self._users > 0 or time.monotonic() - self._idle_since < self.idle_timeout:
+                return False
+            self._thread = None
+            return True
+
+    def _main(self):
+        try:
+            self.run()
+        except Exception as e:
+            logger.exception("%s crashed", self.name)
+            self.output.fail(str(e))
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+
+class Camera(_Worker):
+    """The only reader of one capture device; publishes raw frames to `raw`"""
+
+    def __init__(self, source, fps=STREAM_FPS, idle_timeout=IDLE_TIMEOUT):
+        super().__init__(idle_timeout)
+        self.source = source
+        self.fps = fps
+        self.name = f'camera-{source}'
+        self.raw = self.output
+
+    def run(self):
+        cap = open_capture(self.source)
+        # Devices pace themselves; files and synthetic sources are throttled
+        throttle = not isinstance(cap, cv2.VideoCapture)
+        failures = 0
+        try:
+            if not cap.isOpened():
+                self.output.fail(f'Cannot open camera {self.source}')
+                return
+            while not self._should_stop():
+                started = time.monotonic()
+                ret, img = cap.read()
+                if not ret:
+                    failures += 1
+                    if failures >= MAX_READ_FAILURES:
+                        self.output.fail(f'Camera {self.source} stopped delivering frames')
+                        return
+                    time.sleep(0.05)
+                    continue
+                failures = 0
+                self.raw.publish(img)
+                if throttle:
+                    time.sleep(max(0.0, 1.0 / self.fps - (time.monotonic() - started)))
+        finally:
+            cap.release()
+
+
+class FrameProcessor(_Worker):
+    """Annotates the newest camera frame at a fixed rate and publishes JPEGs.
+
+    One processor runs per (camera, pipeline); any number of MJPEG clients
+    subscribe to its `jpeg` buffer, so detection cost does not grow with
+    the number of viewers.
+    """
+
+    def __init__(self, camera, process, fps=STREAM_FPS, idle_timeout=IDLE_TIMEOUT, name='processor'):
+        super().__init__(idle_timeout)
+        self.camera = camera
+        self.process = process
+        self.fps = fps
+        self.name = f'{name}-{camera.source}'
+        self.jpeg = self.output
+        self.timings = StageTimer()
+
+    def run(self):
+        self.camera.acquire()
+        try:
+            seq = 0
+            interval = 1.0 / self.fps
+            while not self._should_stop():
+                started = time.monotonic()
+                item = self.camera.raw.wait_for(seq, timeout=1.0)
+                if item is None:
+                    if self.camera.raw.error:
+                        self.output.fail(self.camera.raw.error)
+                        return
+                    continue
+                seq, img = item
+                timed = time.monotonic()
+                self.timings.add('capture', timed - started)
+                img = self.process(img.copy())
+                now = time.monotonic()
+                self.timings.add('process', now - timed)
+                timed = now
+                self.jpeg.publish(cv2.imencode('.jpg', img)[1].tobytes())
+                now = time.monotonic()
+                self.timings.add('encode', now - timed)
+                self.timings.add('loop', now - started)
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            self.camera.release()
+
+    def stats(self):
+        """Stage timings of this processor, plus the frame callback's own if it has any"""
+        stats = {
+            'name': self.name,
+            'running': self._thread is not None,
+            'clients': self.users,
+            'targetFps': self.fps,
+            'stages': self.timings.snapshot()
+        }
+        if hasattr(self.process, 'stats'):
+            stats['pipeline'] = self.process.stats()
+        return stats
+
+    def subscribe(self):
+        """Yield JPEG frames as they are produced until the client goes away"""
+        self.acquire()
+        try:
+            seq = 0
+            while True:
+                item = self.jpeg.wait_for(seq, timeout=5.0)
+                if item is None:
+                    if self.jpeg.error:
+                        logger.warning("Stream %s ended: %s", self.name, self.jpeg.error)
+                        return
+                    continue
+                seq, frame = item
+                yield frame
+        finally:
+            self.release()
+
+
+def mjpeg(frames):
+    """Wrap JPEG frames as a multipart/x-mixed-replace body"""
+    for frame in frames:
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+
+
+_registry_lock = threading.Lock()
+_cameras = {}
+_processors = {}
+
+
+def get_camera(source=None):
+    """Return the shared Camera for a source (default CAMERA_SOURCE)"""
+    source = CAMERA_SOURCE if source is None else source
+    with _registry_lock:
+        if source not in _cameras:
+            _cameras[source] = Camera(source)
+        return _cameras[source]
+
+
+def processor_stats(name):
+    """stats() of every processor called `name`, one per camera"""
+    with _registry_lock:
+        processors = [p for (n, _), p in _processors.items() if n == name]
+    return [p.stats() for p in processors]
+
+
+def get_processor(name, make_process, source=None):
+    """Return the shared FrameProcessor `name` for a camera.
+
+    make_process() is called once per camera to build the frame callback,
+    so per-stream state (e.g. face tracks) is never shared between cameras.
+    """
+    camera = get_camera(source)
+    key = (name, camera.source)
+    with _registry_lock:
+        if key not in _processors:
+            _processors[key] = FrameProcessor(camera, make_process(), name=name)
+        return _processors[key]
@@ -0,0 +1,78 @@
+import os
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Faces kept per person when training; 0 keeps every image
+PROTOTYPES_PER_PERSON = int(os.environ.get('TRAIN_PROTOTYPES', 0))
+# dHash bits two crops may differ in and still count as the same frame
+DUPLICATE_DISTANCE = int(os.environ.get('TRAIN_DUPLICATE_DISTANCE', 4))
+HASH_SIZE = 8
+
+
+def dhash(faces, hash_size=HASH_SIZE):
+    """64-bit difference hash per face, as a uint64 array"""
+    bits = np.empty((len(faces), hash_size * hash_size), dtype=bool)
+    for i, face in enumerate(faces):
+        small = cv2.resize(face, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits[i] = (small[:, 1:] > small[:, :-1]).ravel()
+    packed = np.packbits(bits, axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+
+def hamming(hash_value, hashes):
+    """Bit distance from one hash to each of `hashes`"""
+    diff = np.bitwise_xor(hashes, np.uint64(hash_value))
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def select_prototypes(faces, k, duplicate_distance=DUPLICATE_DISTANCE):
+    """Pick at most k mutually distinct faces; returns their indices.
+
+    Starts from the medoid (the most typical frame) and then greedily adds
+    the face farthest from everything picked so far, stopping early once
+    the remaining faces are all near-duplicates of a prototype.
+    """
+    if len(faces) == 0:
+        return []
+    hashes = dhash(faces)
+    distances = np.stack([hamming(h, hashes) for h in hashes])
+    chosen = [int(np.argmin(distances.sum(axis=1)))]
+    nearest = distances[chosen[0]].copy()
+    while len(chosen) < k:
+        candidate = int(np.argmax(nearest))
+        if nearest[candidate] <= duplicate_distance:
+            break
+        chosen.append(candidate)
+        nearest = np.minimum(nearest, distances[candidate])
+    return sorted(chosen)
+
+
+def compact(faces, labels, names, k=PROTOTYPES_PER_PERSON, duplicate_distance=DUPLICATE_DISTANCE):
+    """Reduce each person's faces to at most k diverse prototypes.
+
+    Returns (faces, labels, names) of the kept images plus {name: label}
+    for the dropped ones. With k <= 0 everything is kept.
+    """
+    if k <= 0:
+        return faces, labels, names, {}
+
+    by_person = {}
+    for i, label in enumerate(labels):
+        by_person.setdefault(label, []).append(i)
+
+    keep = []
+    for label, indices in by_person.items():
+        picked = select_prototypes([faces[i] for i in indices], k, duplicate_distance)
+        keep.extend(indices[j] for j in picked)
+    keep.sort()
+
+    kept = set(keep)
+    dropped = {names[i]: labels[i] for i in range(len(names)) if i not in kept}
+    logger.info("Compaction kept %d of %d images (%d persons, k=%d)",
+                len(keep), len(faces), len(by_person), k)
+    return ([faces[i] for i in keep], [labels[i] for i in keep],
+            [names[i] for i in keep], dropped)
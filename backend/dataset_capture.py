@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+import logging
+
+import cv2
+import mysql.connector
+
+import dataset_store
+
+logger = logging.getLogger(__name__)
+
+# Images captured per enrollment
+IMAGES_PER_PERSON = 100
+
+
+def reserve_image_ids(conn, count=IMAGES_PER_PERSON):
+    """Reserve `count` consecutive img_dataset ids; returns the first one.
+
+    The single-row img_id_seq counter is bumped with LAST_INSERT_ID(), which
+    hands the new value back to this connection only, and committed right
+    away; two enrollments running at once therefore get disjoint blocks.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE img_id_seq SET last_id = LAST_INSERT_ID(last_id + %s) WHERE id = 1",
+            (count,)
+        )
+    except mysql.connector.errors.ProgrammingError as e:
+        if e.errno == 1146:
+            raise RuntimeError("Table img_id_seq is missing, run `python migrate.py`") from e
+        raise
+    if cursor.rowcount != 1:
+        raise RuntimeError("img_id_seq is not initialised, run `python migrate.py`")
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    last_id = cursor.fetchone()[0]
+    conn.commit()
+    return last_id - count + 1
+
+
+def crop_face(cascade, gray):
+    """Largest detected face in a grayscale frame as a 200x200 crop, or None"""
+    faces = cascade.detectMultiScale(gray, 1.3, 7)
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return cv2.resize(gray[y:y + h, x:x + w], (200, 200))
+
+
+class ImageWriter:
+    """Writes one person's dataset images on a background thread.
+
+    write() only queues the image, so the capture loop never waits on the
+    disk. Images go to dataset/{nbr}.{img_id}.jpg, or are appended to the
+    packed store when DATASET_FORMAT=packed. close() waits for the queue
+    to drain and returns the ids of the images that were actually written.
+    """
+
+    def __init__(self, nbr, dataset_dir="dataset", store=None, maxsize=32):
+        self.nbr = nbr
+        self.dataset_dir = dataset_dir
+        self.store = store if store is not None else (
+            dataset_store.get_store() if dataset_store.is_packed() else None
+        )
+        self._queue = queue.Queue(maxsize)
+        self._written = []
+        self._thread = threading.Thread(target=self._run, name='dataset-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        done = False
+        while not done:
+            # Drain what is queued so the packed store takes its lock once per batch
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if batch:
+                self._save(batch)
+
+    def _save(self, batch):
+        if self.store is not None:
+            try:
+                self._written.extend(self.store.append_many(
+                    [(self.nbr, img_id, img) for img_id, img in batch]
+                ))
+            except Exception:
+                logger.exception("Could not append %d images to the packed dataset", len(batch))
+            return
+
+        for img_id, img in batch:
+            path = os.path.join(self.dataset_dir, f"{self.nbr}.{img_id}.jpg")
+            try:
+                if cv2.imwrite(path, img):
+                    self._written.append(img_id)
+                else:
+                    logger.warning("Could not write %s", path)
+            except Exception:
+                logger.exception("Could not write %s", path)
+
+    def write(self, img_id, img):
+        self._queue.put((img_id, img))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        return list(self._written)
+
+
+def insert_images(conn, nbr, img_ids):
+    """Record captured images in img_dataset in a single transaction"""
+    if not img_ids:
+        return
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO img_dataset (img_id, img_person) VALUES (%s, %s)",
+        [(img_id, nbr) for img_id in img_ids]
+    )
+    conn.commit()
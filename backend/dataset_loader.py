@@ -0,0 +1,193 @@
+import os
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "dataset_cache"
+FACE_SIZE = 200
+DECODE_WORKERS = int(os.environ.get('DATASET_WORKERS', 0)) or os.cpu_count() or 1
+DECODE_CHUNK = 64
+
+
+def _decode_chunk(paths):
+    """Decode a chunk of images to 200x200 grayscale (runs in a worker process).
+
+    Returns a stacked uint8 array plus a mask of which paths were readable,
+    so only one buffer per chunk is pickled back to the parent.
+    """
+    out = np.zeros((len(paths), FACE_SIZE, FACE_SIZE), np.uint8)
+    ok = np.zeros(len(paths), bool)
+    for i, path in enumerate(paths):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        if img.shape != (FACE_SIZE, FACE_SIZE):
+            img = cv2.resize(img, (FACE_SIZE, FACE_SIZE))
+        out[i] = img
+        ok[i] = True
+    return out, ok
+
+
+def iter_decoded(paths, workers=DECODE_WORKERS, chunk=DECODE_CHUNK):
+    """Decode images in a process pool, yielding (faces, ok) per chunk in order"""
+    chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+    if len(chunks) == 0:
+        return
+    if workers <= 1 or len(chunks) == 1:
+        for c in chunks:
+            yield _decode_chunk(c)
+        return
+
+    # spawn: forking a process that already runs OpenCV/Flask threads can hang
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as pool:
+        for result in pool.map(_decode_chunk, chunks):
+            yield result
+
+
+def iter_batches(entries, dataset_dir, batch_size=256, workers=DECODE_WORKERS):
+    """Stream (faces, labels, names) batches for [(filename, person_id)] entries"""
+    paths = [os.path.join(dataset_dir, name) for name, _ in entries]
+    faces, labels, names = [], [], []
+    pos = 0
+    for decoded, ok in iter_decoded(paths, workers):
+        for i in range(len(decoded)):
+            name, person_id = entries[pos + i]
+            if not ok[i]:
+                logger.warning("Error processing %s: unreadable image", name)
+                continue
+            faces.append(decoded[i])
+            labels.append(person_id)
+            names.append(name)
+        pos += len(decoded)
+        while len(faces) >= batch_size:
+            yield faces[:batch_size], labels[:batch_size], names[:batch_size]
+            faces, labels, names = faces[batch_size:], labels[batch_size:], names[batch_size:]
+    if faces:
+        yield faces, labels, names
+
+
+class DatasetCache:
+    """Packed, memory-mapped cache of decoded dataset faces.
+
+    faces.npy holds an (N, 200, 200) uint8 array, labels.npy the person id
+    for each row and index.json maps filename -> [row, mtime_ns]. A row is
+    reused only while the source file's mtime is unchanged.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.faces_path = os.path.join(cache_dir, "faces.npy")
+        self.labels_path = os.path.join(cache_dir, "labels.npy")
+        self.index_path = os.path.join(cache_dir, "index.json")
+
+    def open(self):
+        """Return (faces memmap, index) or (None, {}) if there is no usable cache"""
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            faces = np.load(self.faces_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None, {}
+        if faces.ndim != 3 or faces.shape[0] != index.get('count'):
+            return None, {}
+        return faces, index['rows']
+
+    def write(self, names, mtimes, labels, fill):
+        """Write a new cache of len(names) rows; fill(out) populates the faces array"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_faces = self.faces_path + ".tmp.npy"
+        out = np.lib.format.open_memmap(
+            tmp_faces, mode='w+', dtype=np.uint8, shape=(len(names), FACE_SIZE, FACE_SIZE)
+        )
+        fill(out)
+        out.flush()
+        del out
+
+        tmp_labels = self.labels_path + ".tmp.npy"
+        np.save(tmp_labels, np.asarray(labels, np.int32))
+
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, 'w') as f:
+            json.dump({
+                'count': len(names),
+                'rows': {name: [row, mtimes[row]] for row, name in enumerate(names)}
+            }, f)
+
+        # index.json goes last; open() rejects a faces.npy whose length disagrees
+        os.replace(tmp_faces, self.faces_path)
+        os.replace(tmp_labels, self.labels_path)
+        os.replace(tmp_index, self.index_path)
+
+        return np.load(self.faces_path, mmap_mode='r')
+
+
+def load_dataset(entries, dataset_dir, update_cache=True, cache=None, workers=DECODE_WORKERS,
+                 progress=None):
+    """Load faces for [(filename, person_id)] entries.
+
+    Images whose file is unchanged since they were cached are read straight
+    from the memory-mapped cache; the rest are decoded in a process pool.
+    With update_cache the cache is rewritten to hold exactly these entries
+    (use it for full retrains). Returns (faces, labels, names) where faces
+    is a list of 200x200 uint8 arrays, unreadable images being skipped.
+    progress(phase, done, total) is called as images become available.
+    """
+    cache = cache or DatasetCache()
+    cached_faces, rows = cache.open()
+
+    mtimes = []
+    for name, _ in entries:
+        try:
+            mtimes.append(os.stat(os.path.join(dataset_dir, name)).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+
+    hit_rows = {}
+    misses = []
+    for i, (name, _) in enumerate(entries):
+        row = rows.get(name)
+        if cached_faces is not None and row is not None and row[1] == mtimes[i]:
+            hit_rows[i] = row[0]
+        elif mtimes[i] is not None:
+            misses.append(i)
+
+    def report(done):
+        if progress is not None:
+            progress('loading', done, len(entries))
+
+    report(len(hit_rows))
+    decoded = {}
+    miss_paths = [os.path.join(dataset_dir, entries[i][0]) for i in misses]
+    pos = 0
+    for faces, ok in iter_decoded(miss_paths, workers):
+        for j in range(len(faces)):
+            if ok[j]:
+                decoded[misses[pos + j]] = faces[j]
+            else:
+                logger.warning("Error processing %s: unreadable image", entries[misses[pos + j]][0])
+        pos += len(faces)
+        report(len(hit_rows) + pos)
+
+    logger.info("Dataset load: %d cached, %d decoded", len(hit_rows), len(decoded))
+
+    keep = [i for i in range(len(entries)) if i in hit_rows or i in decoded]
+    labels = [entries[i][1] for i in keep]
+    names = [entries[i][0] for i in keep]
+
+    if update_cache and (len(decoded) > 0 or len(keep) != len(rows)):
+        def fill(out):
+            for row, i in enumerate(keep):
+                out[row] = cached_faces[hit_rows[i]] if i in hit_rows else decoded[i]
+
+        packed = cache.write(names, [mtimes[i] for i in keep], labels, fill)
+        return list(packed), labels, names
+
+    faces = [cached_faces[hit_rows[i]] if i in hit_rows else decoded[i] for i in keep]
+    return faces, labels, names
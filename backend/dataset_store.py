@@ -0,0 +1,243 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# "files": one dataset/{nbr}.{img_id}.jpg per face (default)
+# "packed": append-only chunked array store in PACKED_DIR
+DATASET_FORMAT = os.environ.get('DATASET_FORMAT', 'files')
+PACKED_DIR = os.environ.get('DATASET_PACKED_DIR', 'dataset_packed')
+# Faces per chunk file (200x200 uint8 each, so 40 MB per chunk)
+CHUNK_ROWS = 1024
+FACE_SIZE = 200
+
+
+def virtual_name(person_id, img_id):
+    """Filename the face would have in the files layout, e.g. 102.5001.jpg"""
+    return f"{person_id}.{img_id}.jpg"
+
+
+def parse_name(name):
+    """Return (person_id, img_id) for a {nbr}.{img_id}.jpg name, or None"""
+    parts = name.split('.')
+    if len(parts) != 3 or parts[2] != 'jpg':
+        return None
+    try:
+        return int(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared by every process writing to the store"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DatasetStore:
+    """Append-only packed store of 200x200 grayscale dataset faces.
+
+    Faces live in fixed-size chunk files (chunk-00000.npy, ...) holding a
+    (CHUNK_ROWS, 200, 200) uint8 array each, so the dataset is a handful
+    of large files instead of one JPEG per face. index.jsonl has one line
+    per face ({"img_id", "person", "pos"}), appended only after the pixels
+    are flushed, so a crash never leaves an index entry without data.
+    Readers memory-map the chunks and get zero-copy views; the in-memory
+    per-person index is refreshed from the tail of index.jsonl, so rows
+    appended by another process (e.g. pack_dataset.py) show up too.
+    """
+
+    def __init__(self, root=PACKED_DIR, chunk_rows=CHUNK_ROWS):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.index_path = os.path.join(root, "index.jsonl")
+        self.lock_path = os.path.join(root, ".lock")
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._records = []
+        self._by_id = {}
+        self._by_person = {}
+        self._chunks = {}
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def _chunk_path(self, chunk):
+        return os.path.join(self.root, f"chunk-{chunk:05d}.npy")
+
+    def _refresh(self):
+        """Read index lines appended since the last call"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Ignore a trailing line that is still being written
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            self._add(record['img_id'], record['person'], record['pos'])
+        self._offset += end
+
+    def _add(self, img_id, person, pos):
+        self._by_id[img_id] = len(self._records)
+        self._records.append((img_id, person, pos))
+        self._by_person.setdefault(person, []).append(img_id)
+
+    def _chunk(self, chunk):
+        mm = self._chunks.get(chunk)
+        if mm is None:
+            mm = np.load(self._chunk_path(chunk), mmap_mode='r')
+            self._chunks[chunk] = mm
+        return mm
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._records)
+
+    def __contains__(self, img_id):
+        with self._lock:
+            self._refresh()
+            return img_id in self._by_id
+
+    def persons(self):
+        """{person_id: image count}"""
+        with self._lock:
+            self._refresh()
+            return {person: len(ids) for person, ids in self._by_person.items()}
+
+    def entries(self, persons=None):
+        """[(virtual filename, person_id)] in insertion order, like training.list_dataset"""
+        with self._lock:
+            self._refresh()
+            return [(virtual_name(person, img_id), person) for img_id, person, _ in self._records
+                    if persons is None or person in persons]
+
+    def get(self, img_id):
+        """Read-only view of one face"""
+        with self._lock:
+            self._refresh()
+            _, _, pos = self._records[self._by_id[img_id]]
+            chunk, row = divmod(pos, self.chunk_rows)
+            return self._chunk(chunk)[row]
+
+    def load(self, entries, progress=None):
+        """(faces, labels, names) for [(name, person_id)] entries, as memmap views"""
+        faces, labels, names = [], [], []
+        with self._lock:
+            self._refresh()
+            for name, person_id in entries:
+                parsed = parse_name(name)
+                index = self._by_id.get(parsed[1]) if parsed else None
+                if index is None:
+                    logger.warning("Error processing %s: not in packed dataset", name)
+                    continue
+                chunk, row = divmod(self._records[index][2], self.chunk_rows)
+                faces.append(self._chunk(chunk)[row])
+                labels.append(person_id)
+                names.append(name)
+        if progress is not None:
+            progress('loading', len(faces), len(entries))
+        return faces, labels, names
+
+    def append_many(self, items):
+        """Append [(person_id, img_id, face)]; returns the img_ids stored.
+
+        Faces are converted to 200x200 grayscale. img_ids already in the
+        store are skipped, which makes re-running a migration safe.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        stored = []
+        seen = set()
+        with self._lock, _file_lock(self.lock_path):
+            self._refresh()
+            pos = len(self._records)
+            open_chunks = {}
+            lines = []
+            for person_id, img_id, face in items:
+                img_id, person_id = int(img_id), int(person_id)
+                if img_id in self._by_id or img_id in seen:
+                    continue
+                seen.add(img_id)
+                if face.ndim == 3:
+                    face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+                if face.shape != (FACE_SIZE, FACE_SIZE):
+                    face = cv2.resize(face, (FACE_SIZE, FACE_SIZE))
+
+                chunk, row = divmod(pos, self.chunk_rows)
+                mm = open_chunks.get(chunk)
+                if mm is None:
+                    path = self._chunk_path(chunk)
+                    if os.path.exists(path):
+                        mm = np.load(path, mmap_mode='r+')
+                    else:
+                        mm = np.lib.format.open_memmap(
+                            path, mode='w+', dtype=np.uint8,
+                            shape=(self.chunk_rows, FACE_SIZE, FACE_SIZE)
+                        )
+                    open_chunks[chunk] = mm
+                mm[row] = face
+                lines.append(json.dumps({'img_id': img_id, 'person': person_id, 'pos': pos}))
+                stored.append(img_id)
+                pos += 1
+
+            for mm in open_chunks.values():
+                mm.flush()
+            del open_chunks
+            if lines:
+                with open(self.index_path, 'a') as f:
+                    f.write('\n'.join(lines) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._refresh()
+        return stored
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide DatasetStore for PACKED_DIR"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DatasetStore()
+        return _store
+
+
+def is_packed():
+    return DATASET_FORMAT == 'packed'
@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+import logging
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# Connection settings, overridable through the environment
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'passwd': os.environ.get('DB_PASSWORD', ''),
+    'database': os.environ.get('DB_NAME', 'flask_db'),
+}
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Connections idle longer than this are pinged before being handed out
+POOL_HEALTHCHECK_IDLE = float(os.environ.get('DB_POOL_HEALTHCHECK_IDLE', 5))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout"""
+
+
+class PooledConnection:
+    """Connection borrowed from a ConnectionPool.
+
+    Behaves like the underlying mysql.connector connection; close() hands
+    it back to the pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to pool")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # A handler that forgot close() must not leak its pool slot
+        self.close()
+
+
+class ConnectionPool:
+    """Fixed-size, thread-safe pool of MySQL connections.
+
+    Connections are opened lazily up to `size`. Checkout blocks up to
+    `timeout` seconds for a free slot, health-checks connections that sat
+    idle for a while, and transparently replaces dead ones. On return any
+    unread results are drained and an open transaction is rolled back, so
+    the next borrower never sees a stale snapshot.
+    """
+
+    def __init__(self, config=None, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 healthcheck_idle=POOL_HEALTHCHECK_IDLE):
+        self.config = dict(config or DB_CONFIG)
+        self.size = size
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        # Idle connections as (conn, returned_at); used LIFO to keep few warm
+        self._idle = []
+        self._stats = {
+            'connects': 0,
+            'checkouts': 0,
+            'in_use': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'healthcheck_failures': 0,
+            'discarded': 0,
+        }
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._stats['connects'] += 1
+        return conn
+
+    def _healthy(self, conn, idle_for):
+        if idle_for < self.healthcheck_idle:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats['healthcheck_failures'] += 1
+            return False
+
+    def get_connection(self, timeout=None):
+        """Borrow a connection; call close() on it to give it back"""
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=timeout):
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise PoolTimeout(f"No database connection available after {timeout}s")
+
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    conn = self._connect()
+                    break
+                candidate, returned_at = entry
+                if self._healthy(candidate, time.monotonic() - returned_at):
+                    conn = candidate
+                else:
+                    self._discard(candidate)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+        return PooledConnection(self, conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _release(self, conn):
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        except Exception as e:
+            logger.warning("Dropping database connection on release: %s", e)
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self.size, idle=len(self._idle))
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+pool = ConnectionPool()
+
+
+def get_connection():
+    return pool.get_connection()
@@ -0,0 +1,173 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+from collections import namedtuple
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background reloads of prs_mstr
+REFRESH_INTERVAL = float(os.environ.get('EMPLOYEE_CACHE_REFRESH', 60))
+
+Employee = namedtuple('Employee', ['nbr', 'name', 'skill', 'active', 'added'])
+
+
+def _fetch_employees(where="", params=()):
+    mydb = db.get_connection()
+    try:
+        mycursor = mydb.cursor()
+        mycursor.execute(
+            "SELECT prs_nbr, prs_name, prs_skill, prs_active, prs_added FROM prs_mstr " + where,
+            params
+        )
+        return [Employee(str(row[0]), *row[1:]) for row in mycursor.fetchall()]
+    finally:
+        mydb.close()
+
+
+class EmployeeDirectory:
+    """In-memory copy of prs_mstr keyed by prs_nbr.
+
+    Loaded on first use and then served from a dict, so the recognition hot
+    path never touches the database. The whole table is reloaded in the
+    background every REFRESH_INTERVAL seconds (to pick up changes made by
+    other processes), and immediately after invalidate(), which writers in
+    this process call after registering or deactivating an employee. A miss
+    falls back to a single-row query so a brand-new employee is found even
+    before the next refresh.
+    """
+
+    def __init__(self, fetch=_fetch_employees, refresh_interval=REFRESH_INTERVAL):
+        self._fetch = fetch
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._employees = None
+        self._missing = set()
+        self._stale = True
+        self._loaded_at = None
+        self._thread = None
+        self._version = None
+        self._changed_at = None
+        self._sorted = None
+
+    def _set(self, employees):
+        """Install a new table (caller holds _lock); bumps the version if it changed"""
+        self._employees = employees
+        version = hashlib.sha1(repr(sorted(employees.items())).encode()).hexdigest()[:16]
+        if version != self._version:
+            self._version = version
+            self._changed_at = time.time()
+            self._sorted = None
+
+    def _load(self):
+        employees = {e.nbr: e for e in self._fetch()}
+        with self._lock:
+            self._set(employees)
+            self._missing = set()
+            self._stale = False
+            self._loaded_at = time.time()
+        logger.info("Employee directory loaded (%d employees)", len(employees))
+        return employees
+
+    def _current(self):
+        employees = self._employees
+        if employees is None or self._stale:
+            # One thread reloads; the others wait and reuse its result
+            with self._load_lock:
+                employees = self._employees
+                if employees is None or self._stale:
+                    employees = self._load()
+        self._ensure_refresher()
+        return employees
+
+    def _ensure_refresher(self):
+        if self.refresh_interval <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._refresh_loop, name='employee-directory', daemon=True
+                    )
+                    self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self._load()
+            except Exception as e:
+                logger.warning("Employee directory refresh failed: %s", e)
+
+    def get(self, nbr):
+        """Return the Employee for prs_nbr, or None if there is no such employee"""
+        nbr = str(nbr)
+        employees = self._current()
+        employee = employees.get(nbr)
+        if employee is not None or nbr in self._missing:
+            return employee
+
+        # Not cached: it may have been added by another process
+        rows = self._fetch("WHERE prs_nbr = %s", (nbr,))
+        with self._lock:
+            if rows:
+                employee = rows[0]
+                self._set({**self._employees, nbr: employee})
+            else:
+                self._missing.add(nbr)
+        return employee
+
+    def get_many(self, nbrs):
+        """Return {prs_nbr: Employee} for the ids that exist"""
+        result = {}
+        for nbr in set(str(n) for n in nbrs):
+            employee = self.get(nbr)
+            if employee is not None:
+                result[nbr] = employee
+        return result
+
+    def all(self):
+        return list(self._current().values())
+
+    def listing(self):
+        """All employees sorted by prs_nbr; cached until the table changes"""
+        employees = self._current()
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(
+                    employees.values(),
+                    key=lambda e: (0, int(e.nbr), e.nbr) if e.nbr.isdigit() else (1, 0, e.nbr)
+                )
+            return self._sorted
+
+    def version(self):
+        """(version, changed_at) of the cached table.
+
+        The version is a fingerprint of the table's content, so it changes
+        after register/deactivate (which invalidate()) and after a reload
+        that picked up changes from another process, and only then.
+        changed_at is when this process first saw that version.
+        """
+        self._current()
+        with self._lock:
+            return self._version, self._changed_at
+
+    def invalidate(self):
+        """Drop the cached table; the next lookup reloads it"""
+        with self._lock:
+            self._stale = True
+
+    def info(self):
+        return {
+            'loaded': self._employees is not None,
+            'employees': len(self._employees or {}),
+            'loadedAt': self._loaded_at,
+            'version': self._version,
+        }
+
+
+directory = EmployeeDirectory()
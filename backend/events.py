@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+# Events kept for clients resuming with Last-Event-ID
+BUFFER_SIZE = int(os.environ.get('EVENTS_BUFFER', 1000))
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+# Client reconnect delay (ms) sent with the retry: field
+RETRY_MS = 3000
+
+
+def _format(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBus:
+    """In-process ring buffer of attendance events, served as Server-Sent Events.
+
+    publish() appends an event with an increasing sequence number and wakes
+    every subscriber; each subscriber is a generator that yields only the
+    events it has not sent yet, so N open dashboards cost one buffer walk
+    per event instead of N polls. Event ids are "<boot>-<seq>": a client
+    reconnecting with Last-Event-ID gets the events it missed, or a
+    `reset` event (reload state over REST) when the id is from another
+    process run or already fell out of the buffer.
+    """
+
+    def __init__(self, size=BUFFER_SIZE, heartbeat=HEARTBEAT):
+        self.boot = format(int(time.time() * 1000), 'x')
+        self.heartbeat = heartbeat
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.subscribers = 0
+
+    def publish(self, event, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            self._cond.notify_all()
+
+    def _id(self, seq):
+        return f"{self.boot}-{seq}"
+
+    def _parse(self, last_event_id):
+        """Sequence number of a Last-Event-ID from this run, else None"""
+        boot, _, seq = (last_event_id or '').partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _after(self, seq):
+        """Buffered events after seq, or None if some were already dropped (caller holds _cond)"""
+        if seq > self._seq:
+            return None
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq < oldest - 1:
+            return None
+        return [e for e in self._events if e[0] > seq]
+
+    def subscribe(self, last_event_id=None):
+        """Generator of SSE text for one client"""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            with self._cond:
+                seq = self._parse(last_event_id)
+                pending = self._after(seq) if seq is not None else None
+            while True:
+                if pending is None:
+                    with self._cond:
+                        seq = self._seq
+                    yield _format(self._id(seq), 'reset', {})
+                elif pending:
+                    for seq, event, data in pending:
+                        yield _format(self._id(seq), event, data)
+                else:
+                    yield ": keep-alive\n\n"
+
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > seq, self.heartbeat)
+                    pending = self._after(seq)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self):
+        with self._cond:
+            return {'lastEventId': self._id(self._seq), 'buffered': len(self._events),
+                    'subscribers': self.subscribers}
+
+
+bus = EventBus()
@@ -34,6 +34,7 @@ CREATE TABLE `absensi` (
   `skill` varchar(100) NOT NULL,
   `tanggal` date NOT NULL,
   `waktu` varchar(100) NOT NULL,
+  `jam` time DEFAULT NULL,
   `latitude` varchar(100) DEFAULT NULL,
   `longitude` varchar(100) DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP
@@ -41,6 +42,20 @@ CREATE TABLE `absensi` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `absensi_daily`
+--
+
+CREATE TABLE `absensi_daily` (
+  `tanggal` date NOT NULL,
+  `present` int NOT NULL DEFAULT 0,
+  `late` int NOT NULL DEFAULT 0,
+  `headcount` int NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `accs_hist`
 --
@@ -65,6 +80,20 @@ CREATE TABLE `img_dataset` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `img_id_seq`
+--
+
+CREATE TABLE `img_id_seq` (
+  `id` tinyint NOT NULL,
+  `last_id` int NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO `img_id_seq` (`id`, `last_id`) VALUES
+(1, 0);
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `prs_mstr`
 --
@@ -77,6 +106,23 @@ CREATE TABLE `prs_mstr` (
   `prs_added` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `schema_migrations`
+--
+
+CREATE TABLE `schema_migrations` (
+  `version` varchar(100) NOT NULL,
+  `applied_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT INTO `schema_migrations` (`version`) VALUES
+('0001_img_id_seq'),
+('0002_absensi_unique_daily'),
+('0003_absensi_jam'),
+('0004_absensi_daily');
+
 --
 -- Indexes for dumped tables
 --
@@ -85,7 +131,15 @@ CREATE TABLE `prs_mstr` (
 -- Indexes for table `absensi`
 --
 ALTER TABLE `absensi`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uq_absensi_person_tanggal` (`person`, `tanggal`),
+  ADD KEY `idx_absensi_tanggal_jam` (`tanggal`, `jam`);
+
+--
+-- Indexes for table `absensi_daily`
+--
+ALTER TABLE `absensi_daily`
+  ADD PRIMARY KEY (`tanggal`);
 
 --
 -- Indexes for table `accs_hist`
@@ -100,12 +154,24 @@ ALTER TABLE `accs_hist`
 ALTER TABLE `img_dataset`
   ADD PRIMARY KEY (`img_id`);
 
+--
+-- Indexes for table `img_id_seq`
+--
+ALTER TABLE `img_id_seq`
+  ADD PRIMARY KEY (`id`);
+
 --
 -- Indexes for table `prs_mstr`
 --
 ALTER TABLE `prs_mstr`
   ADD PRIMARY KEY (`prs_nbr`);
 
+--
+-- Indexes for table `schema_migrations`
+--
+ALTER TABLE `schema_migrations`
+  ADD PRIMARY KEY (`version`);
+
 --
 -- AUTO_INCREMENT for dumped tables
 --
@@ -0,0 +1,289 @@
+import os
+import time
+import logging
+
+import cv2
+
+from camera import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Consecutive confident frames needed to confirm a person
+CONFIRM_FRAMES = int(os.environ.get('RECOGNITION_CONFIRM_FRAMES', 30))
+# Minimum confidence score (0-100) for a frame to count towards confirmation
+STREAM_THRESHOLD = 70
+# Seconds before the same employee can be confirmed again on a stream
+COOLDOWN_SECONDS = float(os.environ.get('RECOGNITION_COOLDOWN', 10))
+# Frames a track survives without a matching detection
+MAX_MISSES = 5
+# Minimum box overlap to treat a detection as the same face
+MIN_IOU = 0.3
+# Run a full-frame face detection every N frames; faces are followed with a
+# cheap search around their last position in between
+DETECT_EVERY = int(os.environ.get('STREAM_DETECT_EVERY', 5))
+# Detection and tracking run on the frame scaled by this factor
+DETECT_SCALE = float(os.environ.get('STREAM_DETECT_SCALE', 0.5))
+# Search window around a tracked face, as a fraction of its size
+TRACK_MARGIN = 0.5
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.person_id = None
+        self.confidence = 0
+        self.streak = 0
+        self.misses = 0
+        self.state = 'unknown'
+        self.classified = False
+
+
+class RecognitionTracker:
+    """Per-stream confirmation state machine.
+
+    Each track keeps the label it was classified with and counts the
+    consecutive frames it has been followed with a confident label; when
+    the count reaches confirm_frames, on_confirm(person_id) is called and
+    the employee enters a cooldown on this stream. Nothing here blocks, so
+    several people in frame are confirmed independently at full rate.
+
+    Track states: 'unknown' (not confident), 'scanning' (collecting
+    frames), 'cooldown' (already confirmed recently).
+    """
+
+    def __init__(self, on_confirm, confirm_frames=CONFIRM_FRAMES, threshold=STREAM_THRESHOLD,
+                 cooldown=COOLDOWN_SECONDS, clock=time.monotonic):
+        self.on_confirm = on_confirm
+        self.confirm_frames = confirm_frames
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.tracks = []
+        self._next_id = 1
+        # person_id -> time of last confirmation on this stream
+        self._confirmed_at = {}
+
+    def in_cooldown(self, person_id, now=None):
+        confirmed_at = self._confirmed_at.get(person_id)
+        now = self.clock() if now is None else now
+        return confirmed_at is not None and now - confirmed_at < self.cooldown
+
+    def match(self, boxes):
+        """Pair detected boxes with existing tracks by overlap.
+
+        Returns [(track or None, box)]; None means a new face.
+        """
+        pairs = sorted(
+            ((iou(t.box, box), ti, di) for ti, t in enumerate(self.tracks) for di, box in enumerate(boxes)),
+            reverse=True
+        )
+        matched_tracks, matched_boxes, result = set(), set(), []
+        for overlap, ti, di in pairs:
+            if overlap < MIN_IOU:
+                break
+            if ti in matched_tracks or di in matched_boxes:
+                continue
+            matched_tracks.add(ti)
+            matched_boxes.add(di)
+            result.append((self.tracks[ti], boxes[di]))
+        result.extend((None, box) for di, box in enumerate(boxes) if di not in matched_boxes)
+        return result
+
+    def update(self, observations, classify, reclassify_unknown=False):
+        """Advance one frame.
+
+        observations: [(track or None, box)] for the faces seen this frame;
+        tracks not listed count a miss. classify(box) -> (person_id,
+        confidence, known) is only called for new tracks, and for unknown
+        tracks when reclassify_unknown is set, so a followed face is
+        classified once instead of on every frame. Returns the live tracks.
+        """
+        now = self.clock()
+        seen = set()
+        for track, box in observations:
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+            track.box = box
+            track.misses = 0
+            if not track.classified or (reclassify_unknown and track.state == 'unknown'):
+                track.classified = True
+                self._label(track, *classify(box))
+            self._advance(track, now)
+            seen.add(track.id)
+
+        for track in self.tracks:
+            if track.id not in seen:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= MAX_MISSES]
+        return [t for t in self.tracks if t.id in seen]
+
+    def _label(self, track, person_id, confidence, known):
+        track.confidence = confidence
+        if confidence <= self.threshold or not known:
+            person_id = None
+        if person_id != track.person_id:
+            track.person_id = person_id
+            track.streak = 0
+
+    def _advance(self, track, now):
+        person_id = track.person_id
+        if person_id is None:
+            track.streak = 0
+            track.state = 'unknown'
+            return
+
+        if self.in_cooldown(person_id, now):
+            track.streak = 0
+            track.state = 'cooldown'
+            return
+
+        track.streak += 1
+        track.state = 'scanning'
+        if track.streak >= self.confirm_frames:
+            self._confirmed_at[person_id] = now
+            track.streak = 0
+            track.state = 'cooldown'
+            try:
+                self.on_confirm(person_id)
+            except Exception:
+                logger.exception("Confirm callback failed for %s", person_id)
+
+
+class LiveRecognizer:
+    """Frame processor for one recognition stream.
+
+    Runs the Haar detector on a downscaled frame only every detect_every
+    frames; in between, each tracked face is searched for in a small window
+    around its last position. LBPH prediction runs once per track (see
+    RecognitionTracker.update). Holds all per-stream state, so every camera
+    gets its own, and keeps per-stage timings for tuning detect_every.
+    """
+
+    def __init__(self, get_recognizer, get_cascade, lookup, on_confirm, tracker=None,
+                 detect_every=DETECT_EVERY, detect_scale=DETECT_SCALE):
+        self.get_recognizer = get_recognizer
+        self.get_cascade = get_cascade
+        self.lookup = lookup
+        self.tracker = tracker or RecognitionTracker(on_confirm)
+        self.detect_every = max(1, detect_every)
+        self.detect_scale = detect_scale
+        self.frame_no = 0
+        self.timings = StageTimer()
+
+    def _to_small(self, box):
+        return tuple(int(round(v * self.detect_scale)) for v in box)
+
+    def _to_full(self, box):
+        return tuple(int(round(v / self.detect_scale)) for v in box)
+
+    def _detect(self, small):
+        faces = self.get_cascade().detectMultiScale(small, 1.1, 10)
+        return [self._to_full(f) for f in faces]
+
+    def _follow(self, small):
+        """Look for each tracked face near where it was last seen"""
+        cascade = self.get_cascade()
+        height, width = small.shape[:2]
+        observations = []
+        for track in self.tracker.tracks:
+            x, y, w, h = self._to_small(track.box)
+            mx, my = int(w * TRACK_MARGIN), int(h * TRACK_MARGIN)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            roi = small[y0:y1, x0:x1]
+            if roi.size == 0:
+                continue
+            size = max(w, h)
+            faces = cascade.detectMultiScale(
+                roi, 1.1, 3,
+                minSize=(max(1, int(size * 0.7)),) * 2,
+                maxSize=(int(size * 1.4) + 1,) * 2
+            )
+            candidates = [self._to_full((fx + x0, fy + y0, fw, fh)) for fx, fy, fw, fh in faces]
+            if candidates:
+                best = max(candidates, key=lambda box: iou(box, track.box))
+                observations.append((track, best))
+        return observations
+
+    def __call__(self, img):
+        # Picks up a retrained model without restarting the stream
+        clf = self.get_recognizer()
+        if clf is None:
+            return img
+
+        frame_start = time.perf_counter()
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        small = gray
+        if self.detect_scale != 1:
+            small = cv2.resize(gray, None, fx=self.detect_scale, fy=self.detect_scale,
+                               interpolation=cv2.INTER_AREA)
+
+        full_detect = self.frame_no % self.detect_every == 0 or not self.tracker.tracks
+        self.frame_no += 1
+        start = time.perf_counter()
+        if full_detect:
+            observations = self.tracker.match(self._detect(small))
+            self.timings.add('detect', time.perf_counter() - start)
+        else:
+            observations = self._follow(small)
+            self.timings.add('track', time.perf_counter() - start)
+
+        def classify(box):
+            x, y, w, h = box
+            start = time.perf_counter()
+            person_id, distance = clf.predict(gray[y:y + h, x:x + w])
+            self.timings.add('predict', time.perf_counter() - start)
+            confidence = clf.confidence(distance)
+            return person_id, confidence, self.lookup(person_id) is not None
+
+        tracks = self.tracker.update(observations, classify, reclassify_unknown=full_detect)
+
+        start = time.perf_counter()
+        for track in tracks:
+            self.draw(img, track)
+        self.timings.add('draw', time.perf_counter() - start)
+        self.timings.add('frame', time.perf_counter() - frame_start)
+        return img
+
+    def stats(self):
+        return {
+            'detectEvery': self.detect_every,
+            'detectScale': self.detect_scale,
+            'tracks': len(self.tracker.tracks),
+            'stages': self.timings.snapshot()
+        }
+
+    def draw(self, img, track, color=(0, 0, 255)):
+        x, y, w, h = track.box
+        cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
+
+        if track.state == 'unknown':
+            cv2.putText(img, 'UNKNOWN', (x, y - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)
+        elif track.state == 'scanning':
+            progress = track.streak / self.tracker.confirm_frames
+            cv2.putText(img, str(int(progress * 100)) + ' %', (x + 20, y + h + 28),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+            cv2.rectangle(img, (x, y + h + 40), (x + w, y + h + 50), color, 2)
+            cv2.rectangle(img, (x, y + h + 40), (x + int(progress * w), y + h + 50),
+                          (255, 255, 255), cv2.FILLED)
+        else:
+            employee = self.lookup(track.person_id)
+            if employee is not None:
+                cv2.putText(img, employee[1] + ' | ' + employee[2], (x - 10, y - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (153, 255, 255), 2, cv2.LINE_AA)
@@ -0,0 +1,115 @@
+"""Apply pending database migrations from backend/migrations.
+
+Migrations are applied in filename order and recorded in the
+schema_migrations table, so each runs once per database. A migration is
+either a .sql file (statements separated by ";" at the end of a line) or a
+.py file defining migrate(conn). Run from the backend directory:
+
+    python migrate.py           # apply pending migrations
+    python migrate.py --status  # list applied / pending
+"""
+import os
+import sys
+import logging
+import argparse
+import importlib.util
+
+import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, path)] sorted by version"""
+    migrations = []
+    for name in sorted(os.listdir(directory)):
+        version, ext = os.path.splitext(name)
+        if ext in ('.sql', '.py') and not name.startswith('_'):
+            migrations.append((version, os.path.join(directory, name)))
+    return migrations
+
+
+def split_sql(text):
+    """Split a SQL script into statements, dropping -- comment lines"""
+    statements, current = [], []
+    for line in text.splitlines():
+        if not current and (not line.strip() or line.strip().startswith('--')):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statements.append('\n'.join(current).rstrip().rstrip(';'))
+            current = []
+    if ''.join(current).strip():
+        statements.append('\n'.join(current))
+    return statements
+
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version varchar(100) NOT NULL PRIMARY KEY,"
+        " applied_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply(conn, version, path):
+    cursor = conn.cursor()
+    if path.endswith('.sql'):
+        with open(path) as f:
+            for statement in split_sql(f.read()):
+                cursor.execute(statement)
+    else:
+        spec = importlib.util.spec_from_file_location(f"migrations.{version}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.migrate(conn)
+    cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+    conn.commit()
+
+
+def migrate(directory=MIGRATIONS_DIR):
+    """Apply every pending migration; returns the versions applied"""
+    conn = db.get_connection()
+    try:
+        done = applied_versions(conn)
+        applied = []
+        for version, path in list_migrations(directory):
+            if version in done:
+                continue
+            logger.info("Applying migration %s", version)
+            apply(conn, version, path)
+            applied.append(version)
+        return applied
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', action='store_true', help='list migrations without applying')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.status:
+        conn = db.get_connection()
+        try:
+            done = applied_versions(conn)
+        finally:
+            conn.close()
+        for version, _ in list_migrations():
+            print(f"{'applied' if version in done else 'pending':<8} {version}")
+        return 0
+
+    applied = migrate()
+    print(f"Applied {len(applied)} migration(s)" + (": " + ", ".join(applied) if applied else ""))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+-- Sequence for img_dataset ids, so concurrent enrollments reserve
+-- disjoint id blocks instead of both reading MAX(img_id)
+CREATE TABLE IF NOT EXISTS `img_id_seq` (
+  `id` tinyint NOT NULL,
+  `last_id` int NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO `img_id_seq` (`id`, `last_id`)
+SELECT 1, IFNULL(MAX(`img_id`), 0) FROM `img_dataset`;
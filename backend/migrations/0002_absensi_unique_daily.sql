@@ -0,0 +1,12 @@
+-- One check-in per person per day, enforced by the database.
+-- Keep the earliest row of any existing duplicates first, otherwise the
+-- unique key cannot be added.
+DELETE a FROM `absensi` a
+JOIN `absensi` b
+  ON a.`person` = b.`person` AND a.`tanggal` = b.`tanggal` AND a.`id` > b.`id`;
+
+-- (person, tanggal) serves the duplicate check; (tanggal, waktu) serves the
+-- today / history / dashboard queries that filter and sort by date and time
+ALTER TABLE `absensi`
+  ADD UNIQUE KEY `uq_absensi_person_tanggal` (`person`, `tanggal`),
+  ADD KEY `idx_absensi_tanggal_waktu` (`tanggal`, `waktu`);
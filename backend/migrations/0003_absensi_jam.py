@@ -0,0 +1,39 @@
+"""Native TIME column for absensi check-in times.
+
+absensi.waktu is a varchar, so reports had to cast it row by row and no
+index on the time could be used. This adds `jam` (TIME) next to it with a
+(tanggal, jam) index and fills it from waktu in id-range batches, each in
+its own transaction, so a large table is never locked in one long UPDATE.
+waktu is kept for display and older clients; new rows get both columns.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "ALTER TABLE absensi"
+        " ADD COLUMN jam time DEFAULT NULL AFTER waktu,"
+        " DROP KEY idx_absensi_tanggal_waktu,"
+        " ADD KEY idx_absensi_tanggal_jam (tanggal, jam)"
+    )
+
+    cursor.execute("SELECT IFNULL(MIN(id), 0), IFNULL(MAX(id), 0) FROM absensi")
+    low, high = cursor.fetchone()
+    filled = 0
+    for start in range(low, high + 1, BATCH_SIZE):
+        # Rows whose waktu is not a clock time keep jam NULL instead of
+        # failing the UPDATE under strict SQL mode
+        cursor.execute(
+            "UPDATE absensi SET jam = CAST(waktu AS TIME)"
+            " WHERE id BETWEEN %s AND %s AND jam IS NULL"
+            " AND waktu REGEXP '^[0-9]{1,2}:[0-9]{2}:[0-9]{2}$'",
+            (start, start + BATCH_SIZE - 1)
+        )
+        filled += max(cursor.rowcount, 0)
+        conn.commit()
+    logger.info("Backfilled absensi.jam for %d rows", filled)
@@ -0,0 +1,17 @@
+-- Per-day attendance summary for the dashboard, kept up to date by the
+-- attendance writer (see attendance_rollup.py)
+CREATE TABLE IF NOT EXISTS `absensi_daily` (
+  `tanggal` date NOT NULL,
+  `present` int NOT NULL DEFAULT 0,
+  `late` int NOT NULL DEFAULT 0,
+  `headcount` int NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`tanggal`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Seed from existing check-ins; past days get today's active headcount
+INSERT IGNORE INTO `absensi_daily` (`tanggal`, `present`, `late`, `headcount`)
+SELECT `tanggal`, COUNT(*), SUM(`jam` > '09:00:00'),
+       (SELECT COUNT(*) FROM `prs_mstr` WHERE `prs_active` = 'Y')
+FROM `absensi`
+GROUP BY `tanggal`;
@@ -0,0 +1,127 @@
+import os
+import threading
+import logging
+
+import cv2
+
+import recognizers
+import sharding
+
+logger = logging.getLogger(__name__)
+
+CASCADE_PATH = "resources/haarcascade_frontalface_default.xml"
+
+
+class ModelRegistry:
+    """Process-wide cache of the trained recognizer and the Haar cascade.
+
+    The recognizer is loaded once and shared by every request. Each call to
+    get_recognizer() does a cheap os.stat() on the model file and, when its
+    mtime/size changed (e.g. after retraining), loads the new model and swaps
+    it in atomically. Requests already holding the old model keep using it.
+    """
+
+    def __init__(self, classifier_path=None, cascade_path=CASCADE_PATH, backend=None,
+                 shard_by=sharding.SHARD_BY, shard_count=sharding.SHARD_COUNT):
+        self.backend = backend or recognizers.BACKEND
+        self.shard_by = shard_by
+        self.shard_count = shard_count
+        self.shard_layout = sharding.layout(shard_by, shard_count)
+        # classifier.xml for LBPH, classifier.npz for the embedding backend;
+        # a sharded model is watched through its shard manifest
+        if classifier_path is None:
+            if self.sharded:
+                classifier_path = sharding.manifest_path()
+            else:
+                classifier_path = recognizers.model_path(self.backend)
+        self.classifier_path = classifier_path
+        # shard file -> (signature, recognizer), reused across reloads
+        self._shard_cache = {}
+        self.cascade_path = cascade_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (file signature, recognizer), replaced as a single tuple so readers
+        # never see a signature paired with the wrong model
+        self._current = (None, None)
+        self._version = 0
+        self._mtime = None
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.classifier_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def is_trained(self):
+        return self._stat_signature() is not None
+
+    def get_recognizer(self):
+        """Return the current recognizer, reloading it if the file changed"""
+        signature = self._stat_signature()
+        if signature is None:
+            return None
+        current_signature, clf = self._current
+        if signature == current_signature:
+            return clf
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            current_signature, clf = self._current
+            if signature == current_signature:
+                return clf
+
+            if self.sharded:
+                clf = sharding.load(self.classifier_path, self.backend, self._shard_cache)
+            else:
+                clf = self.create_recognizer()
+                clf.read(self.classifier_path)
+
+            self._current = (signature, clf)
+            self._version += 1
+            self._mtime = signature[0] / 1e9
+            logger.info("Loaded classifier %s (version %d)", self.classifier_path, self._version)
+            return clf
+
+    @property
+    def sharded(self):
+        return bool(self.shard_by)
+
+    def create_recognizer(self):
+        """Return an empty recognizer of the configured backend"""
+        return recognizers.create(self.backend)
+
+    def reload(self):
+        """Force the next get_recognizer() call to re-read the model file"""
+        with self._lock:
+            self._current = (None, self._current[1])
+        return self.get_recognizer()
+
+    def get_cascade(self):
+        """Return a Haar cascade for the calling thread.
+
+        CascadeClassifier keeps internal scratch buffers, so each worker thread
+        gets its own instance; it is still only parsed once per thread.
+        """
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(self.cascade_path)
+            self._local.cascade = cascade
+        return cascade
+
+    def info(self):
+        """Describe the loaded model for /api/health"""
+        clf = self.get_recognizer()
+        info = {
+            'trained': clf is not None,
+            'backend': self.backend,
+            'version': self._version,
+            'path': self.classifier_path,
+            'mtime': self._mtime,
+        }
+        if self.sharded:
+            info['shards'] = sorted(clf.shards) if clf is not None else []
+        return info
+
+
+registry = ModelRegistry()
@@ -0,0 +1,121 @@
+"""Move dataset/{nbr}.{img_id}.jpg files into the packed dataset store.
+
+Decodes the JPEGs in a process pool and appends them to the packed store
+(DATASET_PACKED_DIR, default dataset_packed/). Images already packed are
+skipped, so the tool can be re-run or resumed. Afterwards every packed
+image is recorded in img_dataset (INSERT IGNORE) and img_id_seq is moved
+past the highest id. Set DATASET_FORMAT=packed once it has run. Run from
+the backend directory:
+
+    python pack_dataset.py [--dataset dataset] [--no-db] [--delete]
+"""
+import os
+import sys
+import logging
+import argparse
+
+import dataset_loader
+import dataset_store
+import db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 512
+
+
+def scan(dataset_dir):
+    """[(filename, person_id, img_id)] for the files layout"""
+    found = []
+    for name in sorted(os.listdir(dataset_dir)):
+        parsed = dataset_store.parse_name(name)
+        if parsed is None:
+            if name.endswith('.jpg'):
+                logger.warning("Skipping %s: not a {nbr}.{img_id}.jpg name", name)
+            continue
+        found.append((name,) + parsed)
+    return found
+
+
+def pack(store, dataset_dir, files):
+    """Append files missing from the store; returns how many were added"""
+    todo = [f for f in files if f[2] not in store]
+    added = 0
+    for start in range(0, len(todo), BATCH_SIZE):
+        batch = todo[start:start + BATCH_SIZE]
+        paths = [os.path.join(dataset_dir, name) for name, _, _ in batch]
+        items = []
+        pos = 0
+        for faces, ok in dataset_loader.iter_decoded(paths):
+            for j in range(len(faces)):
+                name, person_id, img_id = batch[pos + j]
+                if ok[j]:
+                    items.append((person_id, img_id, faces[j]))
+                else:
+                    logger.warning("Skipping %s: unreadable image", name)
+            pos += len(faces)
+        added += len(store.append_many(items))
+        logger.info("Packed %d/%d images", start + len(batch), len(todo))
+    return added
+
+
+def sync_db(store):
+    """Make sure img_dataset lists every packed image and img_id_seq is ahead of them"""
+    rows = []
+    for name, person_id in store.entries():
+        img_id = dataset_store.parse_name(name)[1]
+        rows.append((img_id, str(person_id)))
+    if not rows:
+        return 0
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        inserted = 0
+        for start in range(0, len(rows), 1000):
+            cursor.executemany(
+                "INSERT IGNORE INTO img_dataset (img_id, img_person) VALUES (%s, %s)",
+                rows[start:start + 1000]
+            )
+            inserted += max(cursor.rowcount, 0)
+        cursor.execute(
+            "UPDATE img_id_seq SET last_id = GREATEST(last_id, %s) WHERE id = 1",
+            (max(img_id for img_id, _ in rows),)
+        )
+        conn.commit()
+        return inserted
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default='dataset', help='directory with the JPEG files')
+    parser.add_argument('--store', default=dataset_store.PACKED_DIR, help='packed store directory')
+    parser.add_argument('--no-db', action='store_true', help='do not touch img_dataset / img_id_seq')
+    parser.add_argument('--delete', action='store_true', help='remove JPEGs once they are packed')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if not os.path.isdir(args.dataset):
+        print(f"Dataset directory {args.dataset} not found")
+        return 1
+
+    store = dataset_store.DatasetStore(args.store)
+    files = scan(args.dataset)
+    added = pack(store, args.dataset, files)
+    print(f"{len(files)} files, {added} newly packed, {len(store)} images in {args.store}")
+
+    if not args.no_db:
+        print(f"img_dataset: {sync_db(store)} rows added")
+
+    if args.delete:
+        removed = 0
+        for name, _, img_id in files:
+            if img_id in store:
+                os.remove(os.path.join(args.dataset, name))
+                removed += 1
+        print(f"Removed {removed} packed JPEG files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
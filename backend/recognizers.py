@@ -0,0 +1,304 @@
+import os
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Recognizer used for training and prediction: "lbph" or "embedding"
+BACKEND = os.environ.get('RECOGNIZER_BACKEND', 'lbph')
+# Embedding backend: one vector per image ("image") or per person ("centroid")
+EMBEDDING_MODE = os.environ.get('EMBEDDING_MODE', 'image')
+# Length of the embedding after PCA; 0 keeps the raw LBP histograms
+EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', 128))
+# Side of the square face crop the LBP histograms are computed on
+EMBEDDING_FACE_SIZE = 64
+# Cells per side of the histogram grid
+EMBEDDING_GRID = 8
+# Rows used to fit the PCA projection
+PCA_SAMPLE = 2000
+# Faces embedded per numpy batch
+EMBED_BATCH = 256
+# Cosine distance mapped to a confidence of 0; genuine matches sit well below
+EMBEDDING_MAX_DISTANCE = float(os.environ.get('EMBEDDING_MAX_DISTANCE', 1.0))
+
+
+class LBPHRecognizer:
+    """cv2.face LBPH model behind the common recognizer interface.
+
+    Recognizers expose train/update/predict/search/confidence plus
+    read/write of their model file; callers never touch cv2.face directly.
+    """
+
+    name = 'lbph'
+    extension = '.xml'
+
+    def __init__(self):
+        self._clf = cv2.face.LBPHFaceRecognizer_create()
+
+    def train(self, faces, labels):
+        self._clf.train(faces, np.array(labels))
+
+    def update(self, faces, labels):
+        self._clf.update(faces, np.array(labels))
+
+    def predict(self, face):
+        """Return (label, distance) of the closest training face"""
+        return self._clf.predict(face)
+
+    def search(self, faces, k=1):
+        """Top-k (label, distance) per face; LBPH only knows its best match"""
+        return [[self._clf.predict(face)] for face in faces]
+
+    def confidence(self, distance):
+        return int(100 * (1 - distance / 300))
+
+    def read(self, path):
+        self._clf.read(path)
+
+    def write(self, path):
+        self._clf.write(path)
+
+
+def _uniform_table():
+    """Map the 256 LBP codes to 58 uniform patterns plus one catch-all bin"""
+    table = np.full(256, 58, dtype=np.int64)
+    index = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transitions <= 2:
+            table[code] = index
+            index += 1
+    return table
+
+
+_UNIFORM = _uniform_table()
+_BINS = 59
+# Neighbours in circular order, as (dy, dx)
+_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+
+def lbp_histograms(faces, size=EMBEDDING_FACE_SIZE, grid=EMBEDDING_GRID):
+    """Hellinger-normalised uniform LBP grid histograms, one row per face"""
+    stack = np.empty((len(faces), size, size), dtype=np.int16)
+    for i, face in enumerate(faces):
+        if face.ndim == 3:
+            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        stack[i] = cv2.resize(face, (size, size), interpolation=cv2.INTER_AREA)
+
+    center = stack[:, 1:-1, 1:-1]
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(_OFFSETS):
+        neighbour = stack[:, 1 + dy:size - 1 + dy, 1 + dx:size - 1 + dx]
+        codes |= (neighbour >= center).astype(np.uint8) << bit
+
+    inner = size - 2
+    cell_of = (np.arange(inner) * grid) // inner
+    cells = (cell_of[:, None] * grid + cell_of[None, :]) * _BINS
+    width = grid * grid * _BINS
+    bins = _UNIFORM[codes] + cells + (np.arange(len(faces)) * width)[:, None, None]
+    hist = np.bincount(bins.ravel(), minlength=len(faces) * width)
+    hist = hist.reshape(len(faces), width).astype(np.float32)
+
+    # Hellinger kernel: square roots of the L1-normalised histogram, so a
+    # dot product of L2-normalised rows compares distributions
+    hist = np.sqrt(hist / float(inner * inner))
+    return _l2_normalize(hist)
+
+
+def _l2_normalize(rows):
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.maximum(norms, 1e-12)
+
+
+class EmbeddingRecognizer:
+    """Nearest-neighbour search over compact face vectors.
+
+    Each face becomes an LBP histogram vector (optionally reduced with PCA
+    to EMBEDDING_DIM), stored as one row of a contiguous float32 matrix.
+    A query batch is answered with a single matrix product against it and
+    an argpartition top-k, so cost grows with one dot product per stored
+    row instead of a full histogram comparison. In "centroid" mode the
+    matrix holds one averaged row per person, which is smaller and faster
+    at some cost in accuracy.
+    """
+
+    name = 'embedding'
+    extension = '.npz'
+
+    def __init__(self, mode=EMBEDDING_MODE, dim=EMBEDDING_DIM):
+        if mode not in ('image', 'centroid'):
+            raise ValueError(f"Unknown embedding mode {mode!r}")
+        self.mode = mode
+        self.dim = dim
+        self.mean = None
+        self.components = None
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int64)
+        # Centroid mode keeps unnormalised sums so update() can fold in faces
+        self.sums = None
+        self.counts = None
+
+    def fit_projection(self, faces):
+        """Fit the PCA projection on faces; returns it as (mean, components)"""
+        self.mean = None
+        self.components = None
+        if not self.dim:
+            return self.projection
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(faces), min(len(faces), PCA_SAMPLE), replace=False)
+        raw = lbp_histograms([faces[i] for i in sample])
+        self.mean = raw.mean(axis=0)
+        _, _, vt = np.linalg.svd(raw - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:self.dim], dtype=np.float32)
+        return self.projection
+
+    @property
+    def projection(self):
+        return (self.mean, self.components)
+
+    def embed(self, faces):
+        """Vectors for faces, one L2-normalised row each"""
+        rows = []
+        for start in range(0, len(faces), EMBED_BATCH):
+            hist = lbp_histograms(faces[start:start + EMBED_BATCH])
+            if self.components is not None:
+                hist = _l2_normalize((hist - self.mean) @ self.components.T)
+            rows.append(hist)
+        if not rows:
+            width = len(self.components) if self.components is not None else EMBEDDING_GRID ** 2 * _BINS
+            return np.zeros((0, width), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+
+    def train(self, faces, labels, projection=None):
+        """Build the model from faces.
+
+        projection, a (mean, components) pair taken from another model,
+        is used instead of fitting one on faces, so that several models
+        (shards) embed into the same space and their distances compare.
+        """
+        if projection is None:
+            self.fit_projection(faces)
+        else:
+            self.mean, self.components = projection
+            self.dim = len(self.components) if self.components is not None else 0
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int64)
+        self.sums = self.counts = None
+        self.update(faces, labels)
+
+    def update(self, faces, labels):
+        vectors = self.embed(faces)
+        labels = np.asarray(labels, dtype=np.int64)
+        if self.mode == 'image':
+            self.matrix = np.ascontiguousarray(
+                np.vstack([self.matrix.reshape(-1, vectors.shape[1]), vectors])
+            )
+            self.labels = np.concatenate([self.labels, labels])
+            return
+
+        sums = {} if self.sums is None else dict(zip(self.labels.tolist(), self.sums))
+        counts = {} if self.counts is None else dict(zip(self.labels.tolist(), self.counts.tolist()))
+        for label in np.unique(labels):
+            mask = labels == label
+            sums[int(label)] = sums.get(int(label), 0) + vectors[mask].sum(axis=0)
+            counts[int(label)] = counts.get(int(label), 0) + int(mask.sum())
+        order = sorted(sums)
+        self.labels = np.array(order, dtype=np.int64)
+        self.sums = np.vstack([sums[label] for label in order]).astype(np.float32)
+        self.counts = np.array([counts[label] for label in order], dtype=np.int64)
+        self.matrix = np.ascontiguousarray(_l2_normalize(self.sums))
+
+    def search(self, faces, k=1):
+        """Top-k distinct (label, distance) per face, nearest first.
+
+        distance is the cosine distance 1 - similarity of the closest
+        stored vector of that label.
+        """
+        if len(faces) == 0 or len(self.labels) == 0:
+            return [[] for _ in faces]
+        similarity = self.embed(faces) @ self.matrix.T
+        # Enough rows to usually cover k different people
+        rows = min(similarity.shape[1], k if self.mode == 'centroid' else k * 16)
+        top = np.argpartition(-similarity, rows - 1, axis=1)[:, :rows]
+
+        results = []
+        for i in range(len(faces)):
+            candidates = top[i][np.argsort(-similarity[i, top[i]])]
+            matches, seen = [], set()
+            for row in candidates:
+                label = int(self.labels[row])
+                if label in seen:
+                    continue
+                seen.add(label)
+                matches.append((label, float(1.0 - similarity[i, row])))
+                if len(matches) == k:
+                    break
+            results.append(matches)
+        return results
+
+    def predict(self, face):
+        matches = self.search([face], k=1)[0]
+        return matches[0] if matches else (-1, float('inf'))
+
+    def confidence(self, distance):
+        return int(100 * max(0.0, 1 - distance / EMBEDDING_MAX_DISTANCE))
+
+    def read(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.mode = str(data['mode'])
+            self.matrix = np.ascontiguousarray(data['matrix'], dtype=np.float32)
+            self.labels = data['labels'].astype(np.int64)
+            self.mean = data['mean'] if data['mean'].size else None
+            self.components = data['components'] if data['components'].size else None
+            self.dim = len(self.components) if self.components is not None else 0
+            self.sums = data['sums'] if data['sums'].size else None
+            self.counts = data['counts'] if data['counts'].size else None
+
+    def write(self, path):
+        empty = np.zeros(0, dtype=np.float32)
+        # File object, so numpy does not append its own .npz suffix
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                mode=np.array(self.mode),
+                matrix=self.matrix,
+                labels=self.labels,
+                mean=empty if self.mean is None else self.mean,
+                components=empty if self.components is None else self.components,
+                sums=empty if self.sums is None else self.sums,
+                counts=empty if self.counts is None else self.counts,
+            )
+
+
+BACKENDS = {
+    'lbph': LBPHRecognizer,
+    'embedding': EmbeddingRecognizer,
+}
+
+
+def create(backend=None):
+    """Return an untrained recognizer of the given (default configured) backend"""
+    backend = backend or BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown recognizer backend {backend!r}")
+    return BACKENDS[backend]()
+
+
+def model_path(backend=None, stem="classifier"):
+    """Model file for a backend, e.g. classifier.xml for LBPH"""
+    return stem + BACKENDS[backend or BACKEND].extension
+
+
+def write_atomic(clf, path):
+    """Write a model to a temp file and rename it over path.
+
+    Readers never see a partial model. The temp file keeps the suffix,
+    since OpenCV picks the format from the extension.
+    """
+    stem, ext = os.path.splitext(path)
+    tmp_path = stem + ".tmp" + ext
+    clf.write(tmp_path)
+    os.replace(tmp_path, path)
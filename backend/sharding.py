@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import recognizers
+from employee_directory import directory
+
+logger = logging.getLogger(__name__)
+
+# Split the model into shards: "" (one model), "hash" (prs_nbr modulo
+# RECOGNIZER_SHARDS) or "skill" (one shard per prs_skill / department)
+SHARD_BY = os.environ.get('RECOGNIZER_SHARD_BY', '')
+SHARD_COUNT = int(os.environ.get('RECOGNIZER_SHARDS', 4))
+SHARD_DIR = "classifier_shards"
+SHARD_MANIFEST = "manifest.json"
+# Projection shared by all shards of backends that fit one (embedding PCA);
+# the underscore keeps it apart from shard keys
+SHARD_PROJECTION = "_projection"
+# Threads used to query shards in parallel
+SHARD_WORKERS = int(os.environ.get('RECOGNIZER_SHARD_WORKERS', 0)) or min(8, os.cpu_count() or 1)
+
+_executor = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix='shard-search')
+
+
+def layout(shard_by=SHARD_BY, count=SHARD_COUNT):
+    """Short description of the sharding scheme, stored with the model"""
+    if not shard_by:
+        return None
+    return f"hash-{count}" if shard_by == 'hash' else shard_by
+
+
+def shard_key(person_id, shard_by=SHARD_BY, count=SHARD_COUNT):
+    """Name of the shard holding person_id"""
+    if shard_by == 'hash':
+        return f"{int(person_id) % count:02d}"
+    if shard_by == 'skill':
+        employee = directory.get(person_id)
+        skill = employee.skill if employee is not None else None
+        return re.sub(r'[^a-z0-9]+', '-', (skill or '').lower()).strip('-') or 'unassigned'
+    raise ValueError(f"Unknown shard scheme {shard_by!r}")
+
+
+def manifest_path(shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, SHARD_MANIFEST)
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['shards']
+
+
+def save_manifest(path, shards, backend, shard_layout, projection=None):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'updated': datetime.now().isoformat(),
+            'backend': backend,
+            'layout': shard_layout,
+            'projection': projection,
+            'shards': shards
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _fits_projection(backend):
+    return hasattr(recognizers.BACKENDS[backend], 'fit_projection')
+
+
+def needs_rebuild(registry):
+    """True when the shards cannot be extended incrementally.
+
+    That is the case for a backend that fits a projection (embedding PCA)
+    if the shards were written without a shared one: a new shard would
+    get its own projection and its distances would not compare with the
+    others'.
+    """
+    if not _fits_projection(registry.backend) or not os.path.exists(registry.classifier_path):
+        return False
+    with open(registry.classifier_path) as f:
+        name = json.load(f).get('projection')
+    return not name or not os.path.exists(os.path.join(os.path.dirname(registry.classifier_path), name))
+
+
+def _projection(registry, faces, shard_dir, refit):
+    """(file name, projection) shared by every shard, or (None, None) for LBPH.
+
+    The projection is fitted once on the full training set and stored next
+    to the manifest; incremental updates reuse it for new shards.
+    """
+    if not _fits_projection(registry.backend):
+        return None, None
+    clf = registry.create_recognizer()
+    name = SHARD_PROJECTION + clf.extension
+    path = os.path.join(shard_dir, name)
+    if refit or not os.path.exists(path):
+        clf.fit_projection(faces)
+        recognizers.write_atomic(clf, path)
+    else:
+        clf.read(path)
+    return name, clf.projection
+
+
+class ShardedRecognizer:
+    """Recognizer made of one model per shard.
+
+    Queries go to every shard in parallel (OpenCV and NumPy release the
+    GIL while they work) and the per-shard matches are merged by smallest
+    distance, i.e. best confidence. All shards use the same backend, so
+    their distances are comparable: LBPH histogram distances do not depend
+    on the rest of the model, and embedding shards all use the projection
+    fitted once on the full training set (see write_shards()).
+    """
+
+    def __init__(self, shards, backend):
+        self.shards = shards
+        self.backend = backend
+        self._scorer = recognizers.create(backend)
+
+    def search(self, faces, k=1):
+        if not self.shards:
+            return [[] for _ in faces]
+        futures = [_executor.submit(clf.search, faces, k) for clf in self.shards.values()]
+        per_shard = [f.result() for f in futures]
+
+        results = []
+        for i in range(len(faces)):
+            matches = sorted((m for shard in per_shard for m in shard[i]), key=lambda m: m[1])
+            results.append(matches[:k])
+        return results
+
+    def predict(self, face):
+        matches = self.search([face], k=1)[0]
+        return matches[0] if matches else (-1, float('inf'))
+
+    def confidence(self, distance):
+        return self._scorer.confidence(distance)
+
+
+def load(path, backend, cache):
+    """Build a ShardedRecognizer from the shard manifest at path.
+
+    cache maps shard file -> (signature, recognizer) and is updated in
+    place, so shards whose file did not change are not read again.
+    """
+    shard_dir = os.path.dirname(path)
+    manifest = load_manifest(path)
+    shards = {}
+    for key, entry in manifest.items():
+        shard_path = os.path.join(shard_dir, entry['file'])
+        st = os.stat(shard_path)
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = cache.get(shard_path)
+        if cached is not None and cached[0] == signature:
+            shards[key] = cached[1]
+            continue
+        clf = recognizers.create(backend)
+        clf.read(shard_path)
+        cache[shard_path] = (signature, clf)
+        shards[key] = clf
+        logger.info("Loaded shard %s (%d persons)", key, len(entry['persons']))
+    for stale in set(cache) - {os.path.join(shard_dir, e['file']) for e in manifest.values()}:
+        del cache[stale]
+    return ShardedRecognizer(shards, backend)
+
+
+def _group(faces, labels, shard_by, count):
+    groups = {}
+    keys = {}
+    for face, label in zip(faces, labels):
+        if label not in keys:
+            keys[label] = shard_key(label, shard_by, count)
+        group = groups.setdefault(keys[label], ([], []))
+        group[0].append(face)
+        group[1].append(label)
+    return groups
+
+
+def write_shards(registry, faces, labels, replace=False):
+    """Train or extend the shards that faces belong to; returns their keys.
+
+    With replace, every shard is rebuilt from faces alone and shards that
+    no longer have anyone are removed. Otherwise only the shards of the
+    given persons are read, updated and rewritten; the rest of the model
+    files are left untouched.
+
+    Backends that fit a projection (embedding PCA) fit it once on faces
+    when replacing and reuse the stored one otherwise, so that every
+    shard embeds into the same space.
+    """
+    path = registry.classifier_path
+    shard_dir = os.path.dirname(path)
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest = {} if replace else load_manifest(path)
+    projection_file, projection = _projection(registry, faces, shard_dir, refit=replace)
+
+    groups = _group(faces, labels, registry.shard_by, registry.shard_count)
+    for key, (shard_faces, shard_labels) in groups.items():
+        extension = recognizers.BACKENDS[registry.backend].extension
+        entry = manifest.get(key) or {'file': key + extension, 'persons': []}
+        shard_path = os.path.join(shard_dir, entry['file'])
+        clf = registry.create_recognizer()
+        if key in manifest and os.path.exists(shard_path):
+            clf.read(shard_path)
+            clf.update(shard_faces, shard_labels)
+        elif projection is not None:
+            clf.train(shard_faces, shard_labels, projection=projection)
+        else:
+            clf.train(shard_faces, shard_labels)
+        recognizers.write_atomic(clf, shard_path)
+        entry['persons'] = sorted(set(entry['persons']) | set(int(l) for l in shard_labels))
+        manifest[key] = entry
+
+    if replace:
+        keep = {entry['file'] for entry in manifest.values()} | {projection_file}
+        for name in os.listdir(shard_dir):
+            if name != SHARD_MANIFEST and name not in keep:
+                os.remove(os.path.join(shard_dir, name))
+
+    save_manifest(path, manifest, registry.backend, registry.shard_layout, projection_file)
+    registry.reload()
+    return sorted(groups)
@@ -0,0 +1,64 @@
+import sys
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Fires many clock-ins at once for the same employees (single and bulk
+# endpoint mixed) and checks that today's attendance has exactly one row
+# per employee. Run against a live API; it records real check-ins for today.
+API = "http://localhost:5000/api"
+EMPLOYEES = 5
+REQUESTS_PER_EMPLOYEE = 10
+
+response = requests.get(f"{API}/employees")
+employees = [e['id'] for e in response.json().get('data', []) if e.get('active') == 'Y'][:EMPLOYEES]
+if not employees:
+    print("Error: no active employees to clock in")
+    sys.exit(1)
+
+
+def clock_in(emp_id):
+    r = requests.post(f"{API}/attendance/clock-in", json={'employeeId': emp_id})
+    return r.status_code, r.json()
+
+
+def clock_in_bulk(emp_ids):
+    r = requests.post(f"{API}/attendance/clock-in/bulk",
+                      json={'items': [{'employeeId': e} for e in emp_ids]})
+    return r.status_code, r.json()
+
+
+print(f"Clocking in {len(employees)} employees, {REQUESTS_PER_EMPLOYEE} parallel requests each...")
+with ThreadPoolExecutor(max_workers=32) as pool:
+    futures = [pool.submit(clock_in, e) for e in employees for _ in range(REQUESTS_PER_EMPLOYEE)]
+    futures += [pool.submit(clock_in_bulk, employees) for _ in range(REQUESTS_PER_EMPLOYEE)]
+    responses = [f.result() for f in futures]
+
+recorded = 0
+for status, body in responses:
+    if status == 200 and 'summary' in body:
+        recorded += body['summary']['recorded']
+    elif status == 200 and body.get('success'):
+        recorded += 1
+    elif not body.get('already_checked_in'):
+        print(f"Unexpected response {status}: {json.dumps(body)}")
+
+today = requests.get(f"{API}/attendance/today").json().get('data', [])
+rows = Counter(str(a['employeeId']) for a in today)
+
+print(f"Recorded responses: {recorded}")
+failed = False
+for emp_id in employees:
+    count = rows.get(str(emp_id), 0)
+    mark = "✅" if count == 1 else "❌"
+    print(f"{mark} employee {emp_id}: {count} row(s) today")
+    failed = failed or count != 1
+
+if recorded > len(employees):
+    print(f"❌ {recorded} clock-ins reported as recorded for {len(employees)} employees")
+    failed = True
+
+print("\n❌ FAILED" if failed else "\n✅ SUCCESS: one check-in per employee per day")
+sys.exit(1 if failed else 0)
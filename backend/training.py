@@ -0,0 +1,246 @@
+import os
+import json
+import threading
+import logging
+from datetime import datetime
+
+import compaction
+import dataset_loader
+import dataset_store
+import recognizers
+import sharding
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+DATASET_DIR = "dataset"
+MANIFEST_PATH = "classifier_manifest.json"
+
+# Only one training run may rewrite the model file at a time
+_train_lock = threading.Lock()
+
+
+class TrainingError(Exception):
+    """Training could not run; carries the HTTP status for the API response"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def list_dataset(dataset_dir=DATASET_DIR, persons=None):
+    """List (filename, person_id) for dataset images, optionally for some persons.
+
+    With DATASET_FORMAT=packed the names come from the packed store's index
+    ({nbr}.{img_id}.jpg, as in the files layout) instead of a directory scan.
+    """
+    if dataset_store.is_packed():
+        store = dataset_store.get_store()
+        if not store.exists():
+            raise TrainingError('Dataset directory not found', 404)
+        return store.entries(persons)
+
+    if not os.path.exists(dataset_dir):
+        raise TrainingError('Dataset directory not found', 404)
+
+    entries = []
+    for image_file in os.listdir(dataset_dir):
+        if not image_file.endswith('.jpg'):
+            continue
+        # Parse filename: person_id.img_id.jpg (e.g., 102.1.jpg)
+        parts = image_file.split('.')
+        if len(parts) < 3:
+            continue
+        try:
+            person_id = int(parts[0])
+        except ValueError:
+            continue
+        if persons is not None and person_id not in persons:
+            continue
+        entries.append((image_file, person_id))
+    return entries
+
+
+def load_faces(entries, dataset_dir=DATASET_DIR, update_cache=False, progress=None):
+    """Load grayscale faces for entries via the packed cache / decode pool"""
+    if dataset_store.is_packed():
+        # Already decoded: zero-copy views into the memory-mapped chunks
+        return dataset_store.get_store().load(entries, progress=progress)
+    return dataset_loader.load_dataset(
+        entries, dataset_dir, update_cache=update_cache, progress=progress
+    )
+
+
+def _report(progress, phase, done=None, total=None):
+    if progress is not None:
+        progress(phase, done, total)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Return ({filename: person_id} in the model, {filename: person_id}
+    dropped by compaction), or None if there is no usable manifest.
+
+    A manifest written for another recognizer backend or shard layout does
+    not describe the current model files, so it counts as missing.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('backend', 'lbph') != registry.backend:
+            return None
+        if data.get('shards') != registry.shard_layout:
+            return None
+        images = {name: int(pid) for name, pid in data['images'].items()}
+        dropped = {name: int(pid) for name, pid in data.get('dropped', {}).items()}
+        return images, dropped
+    except (ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable manifest %s: %s", path, e)
+        return None
+
+
+def save_manifest(images, dropped=None, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'updated': datetime.now().isoformat(),
+            'backend': registry.backend,
+            'shards': registry.shard_layout,
+            'images': images,
+            'dropped': dropped or {}
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def _write_model(clf):
+    recognizers.write_atomic(clf, registry.classifier_path)
+    registry.reload()
+
+
+def _summary(mode, images, added, dropped=None, shards=None):
+    summary = {
+        'mode': mode,
+        'total_images': len(images),
+        'unique_persons': len(set(images.values())),
+        'added_images': added
+    }
+    if dropped:
+        summary['dropped_images'] = len(dropped)
+    if shards is not None:
+        summary['shards_written'] = shards
+    return summary
+
+
+def _compact(faces, labels, loaded, prototypes, progress):
+    if prototypes is None:
+        prototypes = compaction.PROTOTYPES_PER_PERSON
+    if prototypes <= 0:
+        return faces, labels, loaded, {}
+    _report(progress, 'compacting', 0, len(faces))
+    return compaction.compact(faces, labels, loaded, prototypes)
+
+
+def train_full(dataset_dir=DATASET_DIR, progress=None, prototypes=None):
+    """Rebuild the model from every image in the dataset.
+
+    With prototypes set (default TRAIN_PROTOTYPES), each person's images
+    are first reduced to that many diverse faces, see compaction.compact().
+    """
+    _report(progress, 'scanning')
+    entries = list_dataset(dataset_dir)
+    if len(entries) == 0:
+        raise TrainingError('No images found in dataset', 404)
+
+    faces, labels, loaded = load_faces(entries, dataset_dir, update_cache=True, progress=progress)
+    if len(faces) == 0:
+        raise TrainingError('No valid faces found', 400)
+    faces, labels, loaded, dropped = _compact(faces, labels, loaded, prototypes, progress)
+
+    _report(progress, 'training', 0, len(faces))
+    if registry.sharded:
+        shards = sharding.write_shards(registry, faces, labels, replace=True)
+        _report(progress, 'saving', len(faces), len(faces))
+    else:
+        clf = registry.create_recognizer()
+        clf.train(faces, labels)
+        _report(progress, 'saving', len(faces), len(faces))
+        _write_model(clf)
+        shards = None
+
+    images = dict(zip(loaded, labels))
+    save_manifest(images, dropped)
+    return _summary('full', images, len(images), dropped, shards)
+
+
+def train_incremental(nbrs, dataset_dir=DATASET_DIR, progress=None, prototypes=None):
+    """Add the images of the given persons that are not in the model yet.
+
+    Falls back to a full build when there is no model or manifest to
+    extend, since there is nothing to update in that case, and when
+    embedding shards were written without a shared projection. With
+    compaction on, the new images are reduced on their own (the model
+    cannot drop faces it already holds); images dropped earlier are not
+    reconsidered.
+    """
+    manifest = load_manifest()
+    if manifest is None or not registry.is_trained():
+        return train_full(dataset_dir, progress, prototypes)
+    if registry.sharded and sharding.needs_rebuild(registry):
+        return train_full(dataset_dir, progress, prototypes)
+    images, dropped = manifest
+
+    _report(progress, 'scanning')
+    entries = [e for e in list_dataset(dataset_dir, persons=set(nbrs))
+               if e[0] not in images and e[0] not in dropped]
+    if len(entries) == 0:
+        return _summary('incremental', images, 0, dropped)
+
+    faces, labels, loaded = load_faces(entries, dataset_dir, progress=progress)
+    if len(faces) == 0:
+        raise TrainingError('No valid faces found', 400)
+    faces, labels, loaded, newly_dropped = _compact(faces, labels, loaded, prototypes, progress)
+
+    # Update a private copy; the shared model keeps serving until the swap
+    _report(progress, 'training', 0, len(faces))
+    if registry.sharded:
+        # Only the shards of these persons are read and rewritten
+        shards = sharding.write_shards(registry, faces, labels)
+        _report(progress, 'saving', len(faces), len(faces))
+    else:
+        clf = registry.create_recognizer()
+        clf.read(registry.classifier_path)
+        clf.update(faces, labels)
+        _report(progress, 'saving', len(faces), len(faces))
+        _write_model(clf)
+        shards = None
+
+    images.update(zip(loaded, labels))
+    dropped.update(newly_dropped)
+    save_manifest(images, dropped)
+    return _summary('incremental', images, len(loaded), dropped, shards)
+
+
+def parse_nbr(nbr):
+    try:
+        return int(nbr)
+    except (TypeError, ValueError):
+        raise TrainingError('Invalid employee id', 400)
+
+
+def train(nbrs, full=False, dataset_dir=DATASET_DIR, progress=None, prototypes=None):
+    """Train for one or more persons, or rebuild everything when full is set.
+
+    progress, if given, is called as progress(phase, done, total) with
+    phase one of 'scanning', 'loading', 'compacting', 'training', 'saving'.
+    prototypes caps the images per person (None: TRAIN_PROTOTYPES, 0: all).
+    """
+    if not isinstance(nbrs, (list, tuple, set)):
+        nbrs = [nbrs]
+    nbrs = [parse_nbr(n) for n in nbrs]
+
+    with _train_lock:
+        if full:
+            return train_full(dataset_dir, progress, prototypes)
+        return train_incremental(nbrs, dataset_dir, progress, prototypes)
@@ -0,0 +1,181 @@
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+
+import training
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around so clients can still fetch their result
+MAX_FINISHED_JOBS = 50
+
+
+class TrainingJob:
+    """One background training run, possibly covering several train requests"""
+
+    def __init__(self, full=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.nbrs = set()
+        self.full = full
+        self.requests = 0
+        self.status = 'queued'
+        self.phase = 'queued'
+        self.images_loaded = 0
+        self.images_total = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.phase_started_at = None
+        self.phase_times = {}
+        self.result = None
+        self.error = None
+        self.error_code = None
+        self.done = threading.Event()
+
+    def progress(self, phase, done=None, total=None):
+        if phase != self.phase:
+            self.phase = phase
+            self.phase_started_at = time.time()
+            self.phase_times[phase] = self.phase_started_at
+        if done is not None and phase == 'loading':
+            self.images_loaded = done
+        if total is not None:
+            self.images_total = total
+
+    def eta_seconds(self, seconds_per_image):
+        """Rough time left, from the load rate so far and the last run's train rate"""
+        if self.status != 'running' or self.images_total is None:
+            return None
+        now = time.time()
+        remaining = 0.0
+        if self.phase == 'loading':
+            elapsed = now - self.phase_started_at
+            if self.images_loaded > 0:
+                left = self.images_total - self.images_loaded
+                remaining += elapsed / self.images_loaded * left
+            if seconds_per_image is not None:
+                remaining += seconds_per_image * self.images_total
+        elif self.phase == 'training' and seconds_per_image is not None:
+            remaining = seconds_per_image * self.images_total - (now - self.phase_started_at)
+        elif self.phase != 'saving':
+            return None
+        return round(max(remaining, 0.0), 1)
+
+    def to_dict(self, seconds_per_image=None):
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'employees': sorted(self.nbrs),
+            'full': self.full,
+            'mergedRequests': self.requests,
+            'imagesLoaded': self.images_loaded,
+            'imagesTotal': self.images_total,
+            'etaSeconds': self.eta_seconds(seconds_per_image),
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class TrainingQueue:
+    """Runs training jobs one at a time on a background thread.
+
+    Requests that arrive while a job is still queued are merged into it, so a
+    burst of enrollments results in a single training run. A request that
+    arrives while a job is running is queued for the next run.
+    """
+
+    def __init__(self, train_func=training.train):
+        self._train = train_func
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._jobs = OrderedDict()
+        self._pending = None
+        self._running = None
+        self._thread = None
+        # Seconds per image of the last LBPH train/update, used for ETAs
+        self._seconds_per_image = None
+
+    def submit(self, nbr, full=False):
+        """Queue training for employee nbr and return the job that will run it"""
+        nbr = training.parse_nbr(nbr)
+        with self._lock:
+            job = self._pending
+            if job is None:
+                job = TrainingJob(full)
+                self._pending = job
+                self._jobs[job.id] = job
+                self._trim()
+            job.nbrs.add(nbr)
+            job.full = job.full or full
+            job.requests += 1
+            self._ensure_worker()
+            self._wakeup.notify()
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def describe(self, job):
+        return job.to_dict(self._seconds_per_image)
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name='training-jobs', daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while self._pending is None:
+                    self._wakeup.wait()
+                job = self._pending
+                self._pending = None
+                self._running = job
+            self._run(job)
+            with self._lock:
+                self._running = None
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        job.progress('scanning')
+        try:
+            job.result = self._train(sorted(job.nbrs), full=job.full, progress=job.progress)
+            job.status = 'done'
+        except training.TrainingError as e:
+            job.status = 'failed'
+            job.error = e.message
+            job.error_code = e.status_code
+        except Exception as e:
+            logger.exception("Training job %s failed", job.id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.error_code = 500
+        finally:
+            now = time.time()
+            times = job.phase_times
+            if 'training' in times and 'saving' in times and job.images_total:
+                self._seconds_per_image = (times['saving'] - times['training']) / job.images_total
+            job.phase = job.status
+            job.finished_at = now
+            job.done.set()
+            logger.info("Training job %s %s", job.id, job.status)
+
+
+queue = TrainingQueue()